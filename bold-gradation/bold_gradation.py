@@ -4,10 +4,14 @@ Created by Sadie L. Bartholomew, May 2022.
 
 """
 
-from os.path import join
-from os import makedirs
+from concurrent.futures import ThreadPoolExecutor
+from itertools import product
+from os.path import exists, join, splitext
+from os import getpid, makedirs, remove, replace
+import hashlib
 
 import numpy as np
+import matplotlib.image as mpimg
 import matplotlib.pyplot as plt
 
 
@@ -15,14 +19,45 @@ import matplotlib.pyplot as plt
 samples = 5000
 x = np.arange(samples) / samples - 0.5
 y = np.arange(samples) / samples - 0.5
-X, Y = np.meshgrid(x, y)
+
+# Set to True to save the designs by colour mapping their pixels straight to
+# images of the given size in pixels (along the longest side), rather than
+# plotting them on figures. The default size matches the designs as they are
+# plotted on the figures saved at 1000 DPI.
+save_designs_directly = False
+direct_image_size = 4620
+
+# Set to True to cache each R field over the full grid in a file in the given
+# directory, keyed by its function and the grid, which is then memory mapped,
+# so that it is evaluated only once, even across processes, and then only the
+# parts of the file for the pixels within the limits of a design are read.
+cache_fields = False
+field_cache_dir = "field_cache"
+field_cache_block_rows = 250
+
+# Set to True to render the designs at the given number of samples across the
+# full grid, for bigger prints, rather than plotting them. The designs are
+# evaluated and colour mapped in square tiles of the given size by worker
+# threads, through memory-mapped files, so memory use depends on the tile size
+# rather than the number of samples. The images are saved as memory-mapped
+# .npy files of RGBA bytes, and also as PNG images if set, though writing
+# those needs memory for the whole image, so is best left off for big prints.
+render_designs_in_tiles = False
+tiled_samples = 20000
+tile_size = 1024
+tile_workers = None
+save_tiled_designs_as_png = False
 
 
 """
 Design name key with value being a list of all design parameters, in order:
     x_lims: 2-tuple of x-axis limits to set to crop the plot as desired;
     y_lims: 2-tuple of y-axis limits to set to crop the plot as desired;
-    R: function to evaluate in terms of the X, Y meshgrid array;
+    R: function of X and Y to evaluate over the x, y grid, where it is only
+       evaluated over the part of the grid within the limits, with X and Y
+       given as a row and a column of the grid that broadcast together (or
+       an array already evaluated over the full grid, which is cropped, but
+       which cannot be rendered in tiles at a different number of samples);
     a: one-parameter function of above R to define the 2D data to display;
     colourmap: the built-in matplotlib colormap to use to supply colouring.
 
@@ -31,14 +66,14 @@ final_designs_top_level = {
     "Union": [
         (1400, 3600),
         (1400, 3600),
-        (1.6 * np.cos(X - Y)) + (1.5 * np.sin(Y ** 2)),
+        lambda X, Y: (1.6 * np.cos(X - Y)) + (1.5 * np.sin(Y ** 2)),
         lambda R: np.cos(np.pi * ((R ** 4))),
         "twilight_shifted",
     ],
     "Forth": [
         (350, 4850),
         (0, 4500),
-        np.power(
+        lambda X, Y: np.power(
             (X ** 5 - X ** 2) ** 2 + (Y ** 6 - Y ** 4 - Y ** 3) ** 2, 1 / 10
         ),
         lambda R: np.cos(np.pi * ((5 * R ** 3 - 20 * R ** 2))),
@@ -47,7 +82,9 @@ final_designs_top_level = {
     "Vicinity": [
         (100, 1000),
         (3800, 4700),
-        np.cos((Y ** 3 + np.pi - X ** 2) / (X ** 3 - Y ** 2))
+        lambda X, Y: np.cos(
+            (Y ** 3 + np.pi - X ** 2) / (X ** 3 - Y ** 2)
+        )
         / (np.sinh(X - Y ** 2) + 1),
         lambda R: np.cos(R) - 1,
         "cubehelix_r",
@@ -58,7 +95,7 @@ final_designs_tubular_forms = {
     "Sharp Left": [
         (3300, 4200),
         (3800, 4700),
-        np.power(
+        lambda X, Y: np.power(
             (500 * X ** 7 - 10 * X ** 2) ** 4
             + (1000 * Y ** 7 - 3 * Y ** 4 - 5 * Y ** 2) ** 2,
             1 / 5,
@@ -69,7 +106,7 @@ final_designs_tubular_forms = {
     "Change of Motion": [
         (500, 2500),
         (1500, 3500),
-        np.power(
+        lambda X, Y: np.power(
             (500 * X ** 6 - 10 * X ** 2) ** 4
             + (1000 * Y ** 7 - 3 * Y ** 4 - 5 * Y ** 2) ** 2,
             1 / 5,
@@ -80,7 +117,7 @@ final_designs_tubular_forms = {
     "Object in the Foreground": [
         (280, 920),
         (560, 1200),
-        np.power(
+        lambda X, Y: np.power(
             (-100 * X ** 6 + 3 * X ** 2) ** 4
             + (200 * Y ** 7 - 15 * Y ** 4 - 10 * Y ** 3) ** 2,
             1 / 7,
@@ -91,7 +128,7 @@ final_designs_tubular_forms = {
     "Direct Approach": [
         (2200, 2800),
         (3500, 4100),
-        np.power(
+        lambda X, Y: np.power(
             (3000 * X ** 6 - 13 * X ** 2) ** 2
             + (800 * Y ** 5 - 133 * Y ** 4 - 5 * Y ** 2) ** 4,
             1 / 5,
@@ -102,7 +139,7 @@ final_designs_tubular_forms = {
     "Sun to Plain": [
         (100, 1000),
         (1240, 2140),
-        np.power(
+        lambda X, Y: np.power(
             (4000 * Y ** 6 + 20 * Y ** 2) ** 2
             + (200 * X ** 6 - 77 * X ** 4 - 5 * X) ** 4,
             1 / 5,
@@ -113,19 +150,117 @@ final_designs_tubular_forms = {
 }
 
 
+def get_visible_pixels(lims, size, margin=1):
+    """Returns the start and stop indices of image pixels within limits.
+
+    A margin of pixels beyond the limits is included, where the image has
+    them, so that the interpolation at the edges of the limits uses the
+    same pixels as it does for the full image.
+
+    """
+    low, high = sorted(lims)
+    start = max(int(np.ceil(low - 0.5)) - margin, 0)
+    stop = min(int(np.floor(high + 0.5)) + 1 + margin, size)
+    return start, stop
+
+
+def get_crop_extent(column_range, row_range):
+    """Returns the extent placing a crop of an image as in the full image."""
+    column_start, column_stop = column_range
+    row_start, row_stop = row_range
+    return (
+        column_start - 0.5,
+        column_stop - 0.5,
+        row_stop - 0.5,
+        row_start - 0.5,
+    )
+
+
+def crop_image(image, xlims, ylims):
+    """Crops an image array to the pixels within limits, before plotting.
+
+    Returns the cropped image along with the extent to plot it with, so that
+    its pixels are placed as they are when the full image is plotted with no
+    extent, so only the pixels to be shown are resampled by 'imshow'.
+
+    """
+    column_range = get_visible_pixels(xlims, image.shape[1])
+    row_range = get_visible_pixels(ylims, image.shape[0])
+    return (
+        image[slice(*row_range), slice(*column_range)],
+        get_crop_extent(column_range, row_range),
+    )
+
+
+def evaluate_visible_field(R, xlims, ylims):
+    """Evaluates R over only the pixels of the grid within the limits.
+
+    Returns the field along with the extent to plot it with, as for a crop
+    of the field over the full grid by 'crop_image'.
+
+    """
+    column_range = get_visible_pixels(xlims, samples)
+    row_range = get_visible_pixels(ylims, samples)
+    field = R(
+        x[np.newaxis, slice(*column_range)], y[slice(*row_range), np.newaxis]
+    )
+    return field, get_crop_extent(column_range, row_range)
+
+
+def get_cached_field(R):
+    """Returns R over the full grid from a memory-mapped cache file.
+
+    The file is keyed by a hash of the bytecode of R with the constants and
+    names it uses, and of the grid. If it does not exist yet, R is evaluated
+    over the grid in blocks of rows into a temporary file, which is renamed
+    once complete so that other processes never read a partial field.
+
+    """
+    code = R.__code__
+    key = hashlib.sha256(code.co_code)
+    key.update(repr((code.co_consts, code.co_names, samples)).encode())
+    cache_path = join(field_cache_dir, f"{key.hexdigest()}.npy")
+
+    if not exists(cache_path):
+        makedirs(field_cache_dir, exist_ok=True)
+        temporary_path = f"{cache_path}.{getpid()}.tmp"
+        field = np.lib.format.open_memmap(
+            temporary_path, mode="w+", shape=(samples, samples)
+        )
+        for start in range(0, samples, field_cache_block_rows):
+            stop = start + field_cache_block_rows
+            field[start:stop] = R(x[np.newaxis, :], y[start:stop, np.newaxis])
+        field.flush()
+        del field
+        replace(temporary_path, cache_path)
+
+    return np.load(cache_path, mmap_mode="r")
+
+
+def get_visible_field(R, xlims, ylims):
+    """Returns R over the pixels within the limits, with the plot extent."""
+    if callable(R) and cache_fields:
+        R = get_cached_field(R)
+    if callable(R):
+        return evaluate_visible_field(R, xlims, ylims)
+    # R is already evaluated over the full grid, so crop it
+    return crop_image(R, xlims, ylims)
+
+
 def plot_design(design_name, design, save_path):
     """Configures, plots and saves each design on a clean canvas."""
     fig, ax = plt.subplots(figsize=(6, 6))
 
     # Create design
     xlims, ylims, R, a, colourmap = design
-    a_R = a(R)
+    R_visible, extent = get_visible_field(R, xlims, ylims)
+    a_R = a(R_visible)
     # Note: the use of image antialiasing was important for finding nice
     # designs from exploration of mathematical functions which could
     # produce areas of high complexity/detail, but it probably has little
     # if any effect on the outcomes from the final designs, as they focus
     # in on areas which vary only very gradually by manual selection.
-    ax.imshow(a_R, interpolation="antialiased", cmap=colourmap)
+    ax.imshow(a_R, interpolation="antialiased", cmap=colourmap, extent=extent)
     ax.set_xlim(*xlims)
     ax.set_ylim(*ylims)
 
@@ -141,13 +276,211 @@ def plot_design(design_name, design, save_path):
     )
 
 
+def colour_map_image(image, colourmap, vmin, vmax):
+    """Maps an image to RGBA bytes through the lookup table of a colourmap.
+
+    Values are scaled between vmin and vmax and mapped to the colours of
+    the table by indexing it, as 'imshow' does, with any non-finite values
+    given the 'bad' colour of the colourmap.
+
+    """
+    cmap = plt.get_cmap(colourmap)
+    lookup_table = np.concatenate(
+        (cmap(np.arange(cmap.N), bytes=True), [cmap(np.nan, bytes=True)])
+    )
+
+    invalid = ~np.isfinite(image)
+    scale = cmap.N / (vmax - vmin) if vmax > vmin else 0
+    scaled = (np.where(invalid, vmin, image) - vmin) * scale
+    indices = np.clip(scaled, 0, cmap.N - 1).astype(np.intp)
+    indices[invalid] = cmap.N
+
+    return lookup_table[indices]
+
+
+def resample_image(image, row_coordinates, column_coordinates):
+    """Resamples an image at coordinates in units of its pixels.
+
+    As for 'imshow' with antialiased interpolation, pixels are sampled by
+    nearest neighbour where the image is upsampled by three times or more,
+    since the pixels should then be visible, else bilinearly.
+
+    """
+    rows_per_pixel = abs(row_coordinates[1] - row_coordinates[0])
+    columns_per_pixel = abs(column_coordinates[1] - column_coordinates[0])
+    if max(rows_per_pixel, columns_per_pixel) <= 1 / 3:
+        rows = np.clip(np.round(row_coordinates), 0, image.shape[0] - 1)
+        columns = np.clip(np.round(column_coordinates), 0, image.shape[1] - 1)
+        return image[np.ix_(rows.astype(np.intp), columns.astype(np.intp))]
+
+    for axis, coordinates in enumerate((row_coordinates, column_coordinates)):
+        coordinates = np.clip(coordinates, 0, image.shape[axis] - 1)
+        lower = np.minimum(coordinates.astype(np.intp), image.shape[axis] - 2)
+        weights = np.expand_dims(coordinates - lower, 1 - axis)
+        lower_values = np.take(image, lower, axis)
+        upper_values = np.take(image, lower + 1, axis)
+        image = lower_values + weights * (upper_values - lower_values)
+
+    return image
+
+
+def save_design_directly(design_name, design, save_path):
+    """Saves a design straight to an image, without plotting it.
+
+    The pixels within the limits of the design are resampled to the image
+    size and colour mapped, so the image matches the design as plotted,
+    without the whitespace padding its figure.
+
+    """
+    xlims, ylims, R, a, colourmap = design
+    R_visible, extent = get_visible_field(R, xlims, ylims)
+    a_R = a(R_visible)
+
+    # Find the centres of the image pixels in units of the pixels of a_R,
+    # whose first pixel is centred half a pixel in from the extent edges.
+    # The image has the x limits left to right and the y limits top down.
+    x_size, y_size = abs(xlims[1] - xlims[0]), abs(ylims[1] - ylims[0])
+    width = round(direct_image_size * x_size / max(x_size, y_size))
+    height = round(direct_image_size * y_size / max(x_size, y_size))
+    column_centres = xlims[0] + (np.arange(width) + 0.5) * (
+        (xlims[1] - xlims[0]) / width
+    )
+    row_centres = ylims[1] + (np.arange(height) + 0.5) * (
+        (ylims[0] - ylims[1]) / height
+    )
+
+    image = resample_image(
+        a_R, row_centres - extent[3] - 0.5, column_centres - extent[0] - 0.5
+    )
+    mpimg.imsave(
+        save_path,
+        colour_map_image(image, colourmap, np.nanmin(a_R), np.nanmax(a_R)),
+    )
+
+
+def evaluate_tile(R, a, x_tile, y_tile, a_R_tile):
+    """Evaluates a(R) over a tile into an array, returning its range."""
+    a_R_tile[...] = a(R(x_tile[np.newaxis, :], y_tile[:, np.newaxis]))
+    return np.nanmin(a_R_tile), np.nanmax(a_R_tile)
+
+
+def colour_map_tile(a_R_tile, colourmap, vmin, vmax, image_tile, flips):
+    """Colour maps a tile of a(R) into an image, flipping any given axes."""
+    colours = colour_map_image(a_R_tile, colourmap, vmin, vmax)
+    image_tile[...] = np.flip(colours, flips)
+
+
+def render_design_in_tiles(design_name, design, save_path):
+    """Renders a design at high resolution from tiles evaluated in parallel.
+
+    The pixels of a grid of 'tiled_samples' across within the limits of the
+    design are split into tiles. Each tile of a(R) is evaluated in a worker
+    thread into a memory-mapped scratch file, then, given the range of a(R)
+    over all tiles, each tile is colour mapped into a memory-mapped image,
+    oriented as the design is when plotted.
+
+    """
+    xlims, ylims, R, a, colourmap = design
+    if not callable(R):
+        raise TypeError(
+            f"Design '{design_name}' has R evaluated over the grid of "
+            "'samples' already, so it can't be rendered in tiles at "
+            "'tiled_samples', give R as a function of X and Y instead!"
+        )
+    grid = np.arange(tiled_samples) / tiled_samples - 0.5
+    scale = tiled_samples / samples
+    x_visible = grid[
+        slice(*get_visible_pixels(np.multiply(xlims, scale), tiled_samples, 0))
+    ]
+    y_visible = grid[
+        slice(*get_visible_pixels(np.multiply(ylims, scale), tiled_samples, 0))
+    ]
+    shape = (len(y_visible), len(x_visible))
+    tiles = [
+        (
+            slice(row, min(row + tile_size, shape[0])),
+            slice(column, min(column + tile_size, shape[1])),
+        )
+        for row, column in product(
+            range(0, shape[0], tile_size), range(0, shape[1], tile_size)
+        )
+    ]
+
+    # The image has the x limits left to right and the y limits bottom to
+    # top, where rows count down from the top when plotted with 'imshow', so
+    # flip the tiles, and where they go in the image, accordingly
+    flips = []
+    if ylims[0] < ylims[1]:
+        flips.append(0)
+    if xlims[0] > xlims[1]:
+        flips.append(1)
+    image_tiles = []
+    for tile in tiles:
+        image_tile = list(tile)
+        for axis in flips:
+            image_tile[axis] = slice(
+                shape[axis] - tile[axis].stop, shape[axis] - tile[axis].start
+            )
+        image_tiles.append(tuple(image_tile))
+
+    image_path = f"{splitext(save_path)[0]}.npy"
+    scratch_path = f"{image_path}.{getpid()}.tmp"
+    a_R = np.lib.format.open_memmap(scratch_path, mode="w+", shape=shape)
+    image = np.lib.format.open_memmap(
+        image_path, mode="w+", dtype=np.uint8, shape=shape + (4,)
+    )
+
+    with ThreadPoolExecutor(tile_workers) as executor:
+        futures = [
+            executor.submit(
+                evaluate_tile,
+                R,
+                a,
+                x_visible[columns],
+                y_visible[rows],
+                a_R[rows, columns],
+            )
+            for rows, columns in tiles
+        ]
+        tile_ranges = [future.result() for future in futures]
+        vmin = np.nanmin([tile_range[0] for tile_range in tile_ranges])
+        vmax = np.nanmax([tile_range[1] for tile_range in tile_ranges])
+
+        futures = [
+            executor.submit(
+                colour_map_tile,
+                a_R[tile],
+                colourmap,
+                vmin,
+                vmax,
+                image[image_tile],
+                flips,
+            )
+            for tile, image_tile in zip(tiles, image_tiles)
+        ]
+        for future in futures:
+            future.result()
+
+    image.flush()
+    del a_R
+    remove(scratch_path)
+    if save_tiled_designs_as_png:
+        mpimg.imsave(save_path, image)
+
+
 def plot_and_save_all_designs():
     """Plots and saves all chosen designs."""
     parent_dir_name = "designs"
+    if render_designs_in_tiles:
+        save_design = render_design_in_tiles
+    elif save_designs_directly:
+        save_design = save_design_directly
+    else:
+        save_design = plot_design
 
     # Top-level designs
     for design_name, design in final_designs_top_level.items():
-        plot_design(
+        save_design(
             design_name,
             design,
             join(parent_dir_name, f"{design_name}.png".replace(" ", "_")),
@@ -162,10 +495,11 @@ def plot_and_save_all_designs():
             sub_dir_name,
             f"{design_name}.png".replace(" ", "_"),
         )
-        plot_design(design_name, design, save_dir)
+        save_design(design_name, design, save_dir)
 
     # Show all designs once generated and saved
     plt.show()
 
 
-plot_and_save_all_designs()
+if __name__ == "__main__":
+    plot_and_save_all_designs()
@@ -33,10 +33,14 @@ Created by Sadie L. Bartholomew, February 2022.
 """
 
 from itertools import cycle
+from multiprocessing import Pool, shared_memory
 from os.path import join
 
+import matplotlib.animation as animation
 import matplotlib.pyplot as plt
 
+import numpy as np
+
 
 # Define three colour schemes to use across all nine designs (three uses each)
 BACKGROUND_COL_1 = "#452145"  # dark purple
@@ -107,6 +111,124 @@ WINDOW_2 = ((5000, 18000), (110, 190))
 WINDOW_3 = ((1750, 20000), (5, 170))
 
 
+# Parameters for all nine designs, as the arguments, in order, to pass to
+# 'create_and_save_design' after the sequence:
+DESIGNS = [
+    # Design 1: dense, in purple and green colour scheme.
+    (
+        1,
+        PATTERN_SHIFT_1,
+        WINDOW_1,
+        BACKGROUND_COL_1,
+        FOREGOUND_COLOURS_1,
+        "v",
+        8,
+        0.05,
+    ),
+    # Design 2: sparser in black and bold colours.
+    (
+        2,
+        PATTERN_SHIFT_3,
+        WINDOW_3,
+        BACKGROUND_COL_2,
+        FOREGOUND_COLOURS_2,
+        "v",
+        6,
+        0.02,
+    ),
+    # Design 3: sparsest in blue, red, green and yellow on maroon scheme.
+    (
+        3,
+        PATTERN_SHIFT_2,
+        WINDOW_2,
+        BACKGROUND_COL_3,
+        FOREGOUND_COLOURS_3,
+        "v",
+        8,
+        0.05,
+    ),
+    # Design 4: oversize markers giving blur effect: crosses.
+    (
+        4,
+        PATTERN_SHIFT_3,
+        WINDOW_3,
+        BACKGROUND_COL_2,
+        FOREGOUND_COLOURS_2,
+        "X",
+        11,
+        0.03,
+    ),
+    # Design 5: oversize markers giving blur effect: square markers.
+    (
+        5,
+        PATTERN_SHIFT_2,
+        WINDOW_2,
+        BACKGROUND_COL_3,
+        FOREGOUND_COLOURS_3,
+        "s",
+        15,
+        0.03,
+    ),
+    # Design 6: oversize markers giving blur effect: rotated square.
+    (
+        6,
+        PATTERN_SHIFT_1,
+        WINDOW_1,
+        BACKGROUND_COL_1,
+        FOREGOUND_COLOURS_1,
+        "D",
+        18,
+        0.03,
+    ),
+    # Design 7: very transparent with many shifts and oversized markers too.
+    (
+        7,
+        PATTERN_SHIFT_1 + PATTERN_SHIFT_2 + PATTERN_SHIFT_3,
+        ((9850, 10900), (27, 79)),
+        BACKGROUND_COL_2,
+        FOREGOUND_COLOURS_2,
+        "x",
+        30,
+        0.04,
+    ),
+    # Design 8: ditto to above, but the markers aren't as oversized.
+    (
+        8,
+        PATTERN_SHIFT_1 + PATTERN_SHIFT_2 + PATTERN_SHIFT_3,
+        ((13500, 15500), (20, 80)),
+        BACKGROUND_COL_3,
+        FOREGOUND_COLOURS_3,
+        "H",
+        20,
+        0.03,
+    ),
+    # Design 9: many scatter patterns but only slighty transparent markers
+    # giving a paint-smudge-like effect.
+    (
+        9,
+        PATTERN_SHIFT_1 + PATTERN_SHIFT_2 + PATTERN_SHIFT_3,
+        ((13000, 19000), (10, 80)),
+        BACKGROUND_COL_1,
+        FOREGOUND_COLOURS_1,
+        "4",
+        18,
+        0.4,
+    ),
+]
+
+# Set to True to render the designs above across a pool of worker processes
+# rather than one after another, with this many processes (None uses all
+# available CPUs)
+RENDER_IN_PARALLEL = False
+PARALLEL_PROCESSES = None
+
+# Set to True to also create an animation zooming from the full plot range
+# into one of the windows above, as per the GIF referenced in the docstring
+CREATE_ZOOM_ANIMATION = False
+ZOOM_ANIMATION_FRAMES = 240
+ZOOM_ANIMATION_FPS = 30
+
+
 def collatz():
     """TODO."""
     steps = []
@@ -124,8 +246,27 @@ def collatz():
 
 
 def shift_sequence(seq, m, c):
-    """TODO."""
-    return [m * x + c for x in seq]
+    """Return the sequence array scaled by 'm' and translated by 'c'.
+
+    The factors 'm' and 'c' may be arrays which broadcast against the
+    sequence, to apply many shifts at once.
+
+    """
+    return m * np.asarray(seq) + c
+
+
+def shift_sequences(seq, pattern_shifts):
+    """Return all shifts of the sequence as rows of a single 2D array.
+
+    The shifts are computed together by broadcasting the sequence against
+    the column arrays of scale and translation factors, so each row of
+    the result can be passed on to plot as a view without any copying.
+
+    """
+    scales, translations = np.array(pattern_shifts, dtype=float).T
+    return shift_sequence(
+        seq, scales[:, np.newaxis], translations[:, np.newaxis]
+    )
 
 
 def create_formatted_figure(xy_limits, background_col):
@@ -158,9 +299,9 @@ def create_and_save_design(
 ):
     """TODO."""
     fig, axes = create_formatted_figure(xy_limits, background_col)
-    for pattern_shift in pattern_shifts:
+    for shifted_seq in shift_sequences(seq, pattern_shifts):
         axes.plot(
-            shift_sequence(seq, *pattern_shift),
+            shifted_seq,
             marker_type,
             color=next(foreground_cols),
             markersize=marker_size,
@@ -173,126 +314,201 @@ def create_and_save_design(
     )
 
 
-# For efficiency, calculate this only once, to re-use, since it is static.
-collatz_iterations = collatz()
-
-# Design 1: dense, in purple and green colour scheme.
-create_and_save_design(
-    collatz_iterations,
-    1,
-    PATTERN_SHIFT_1,
-    WINDOW_1,
-    BACKGROUND_COL_1,
-    FOREGOUND_COLOURS_1,
-    "v",
-    8,
-    0.05,
-)
+def interpolate_zoom_window(full_limits, xy_limits, fraction):
+    """Return the window a given fraction of the way into a zoom.
 
-# Design 2: sparser in black and bold colours.
-create_and_save_design(
-    collatz_iterations,
-    2,
-    PATTERN_SHIFT_3,
-    WINDOW_3,
-    BACKGROUND_COL_2,
-    FOREGOUND_COLOURS_2,
-    "v",
-    6,
-    0.02,
-)
+    The window edges are moved such that the spans shrink geometrically,
+    so that the zoom appears to proceed at a constant rate throughout
+    rather than slowing down drastically as the window gets small.
 
-# Design 3: sparsest in blue, red, green and yellow on maroon colour scheme.
-create_and_save_design(
-    collatz_iterations,
-    3,
-    PATTERN_SHIFT_2,
-    WINDOW_2,
-    BACKGROUND_COL_3,
-    FOREGOUND_COLOURS_3,
-    "v",
-    8,
-    0.05,
-)
+    """
+    window = []
+    for (start_min, start_max), (end_min, end_max) in zip(
+        full_limits, xy_limits
+    ):
+        start_span = start_max - start_min
+        end_span = end_max - end_min
+        span = start_span * (end_span / start_span) ** fraction
+        # Position the window so its edges move in proportion to the span
+        if start_span == end_span:
+            progress = fraction
+        else:
+            progress = (start_span - span) / (start_span - end_span)
+        low = start_min + progress * (end_min - start_min)
+        window.append((low, low + span))
 
-# Design 4: oversize markers giving blur effect: crosses.
-create_and_save_design(
-    collatz_iterations,
-    4,
-    PATTERN_SHIFT_3,
-    WINDOW_3,
-    BACKGROUND_COL_2,
-    FOREGOUND_COLOURS_2,
-    "X",
-    11,
-    0.03,
-)
+    return tuple(window)
 
-# Design 5: oversize markers giving blur effect: square markers.
-create_and_save_design(
-    collatz_iterations,
-    5,
-    PATTERN_SHIFT_2,
-    WINDOW_2,
-    BACKGROUND_COL_3,
-    FOREGOUND_COLOURS_3,
-    "s",
-    15,
-    0.03,
-)
 
-# Design 6: oversize markers giving blur effect: rotated square.
-create_and_save_design(
-    collatz_iterations,
-    6,
-    PATTERN_SHIFT_1,
-    WINDOW_1,
-    BACKGROUND_COL_1,
-    FOREGOUND_COLOURS_1,
-    "D",
-    18,
-    0.03,
-)
+def create_and_save_zoom_animation(
+    seq,
+    name,
+    pattern_shifts,
+    xy_limits,
+    background_col,
+    foreground_cols,
+    marker_type,
+    marker_size,
+    marker_alpha,
+):
+    """Animate a zoom from the full plot range into a design window.
+
+    A single figure is created with one line per pattern shift, and each
+    frame only updates the data and marker size of those lines to the
+    points within the current window, so per-frame cost is bounded by the
+    points in view. Frames are written to the video as they are drawn.
+
+    """
+    shifted_seqs = shift_sequences(seq, pattern_shifts)
+    indices = np.arange(len(seq))
+    full_limits = (
+        (0, len(seq)),
+        (min(0, shifted_seqs.min()), shifted_seqs.max()),
+    )
+    end_area = (xy_limits[0][1] - xy_limits[0][0]) * (
+        xy_limits[1][1] - xy_limits[1][0]
+    )
 
-# Design 7: very transparent with many shifts and oversized markers too.
-create_and_save_design(
-    collatz_iterations,
-    7,
-    PATTERN_SHIFT_1 + PATTERN_SHIFT_2 + PATTERN_SHIFT_3,
-    ((9850, 10900), (27, 79)),
-    BACKGROUND_COL_2,
-    FOREGOUND_COLOURS_2,
-    "x",
-    30,
-    0.04,
-)
+    fig, axes = create_formatted_figure(full_limits, background_col)
+    lines = [
+        axes.plot(
+            [],
+            [],
+            marker_type,
+            color=next(foreground_cols),
+            alpha=marker_alpha,
+        )[0]
+        for _ in pattern_shifts
+    ]
 
-# Design 8: ditto to above, but the markers aren't as oversized.
-create_and_save_design(
-    collatz_iterations,
-    8,
-    PATTERN_SHIFT_1 + PATTERN_SHIFT_2 + PATTERN_SHIFT_3,
-    ((13500, 15500), (20, 80)),
-    BACKGROUND_COL_3,
-    FOREGOUND_COLOURS_3,
-    "H",
-    20,
-    0.03,
-)
+    def update_zoom_frame(frame):
+        """Update the lines and limits for a frame of the zoom."""
+        fraction = frame / max(ZOOM_ANIMATION_FRAMES - 1, 1)
+        (x_min, x_max), (y_min, y_max) = interpolate_zoom_window(
+            full_limits, xy_limits, fraction
+        )
+        axes.set_xlim(x_min, x_max)
+        axes.set_ylim(y_min, y_max)
+
+        # Markers grow as the zoom progresses, in proportion to the linear
+        # scale, reaching the design marker size at the final window.
+        area = (x_max - x_min) * (y_max - y_min)
+        use_marker_size = marker_size * (end_area / area) ** 0.5
+
+        # The x values are the sequence indices, so slice out the window
+        # along x and then mask the remaining points on the y limits.
+        start = max(int(np.ceil(x_min)), 0)
+        stop = min(int(np.floor(x_max)) + 1, len(seq))
+        for line, shifted_seq in zip(lines, shifted_seqs):
+            window_seq = shifted_seq[start:stop]
+            in_window = (window_seq >= y_min) & (window_seq <= y_max)
+            line.set_data(
+                indices[start:stop][in_window], window_seq[in_window]
+            )
+            line.set_markersize(use_marker_size)
+
+        return lines
+
+    anim = animation.FuncAnimation(
+        fig,
+        update_zoom_frame,
+        frames=ZOOM_ANIMATION_FRAMES,
+        cache_frame_data=False,
+    )
+    anim.save(
+        join("designs", f"collatz_zoom_into_{name}.mp4"),
+        writer=animation.FFMpegWriter(
+            fps=ZOOM_ANIMATION_FPS, extra_args=["-vcodec", "libx264"]
+        ),
+        savefig_kwargs={"facecolor": background_col},
+    )
 
-# Design 9: many scatter patterns but only slighty transparent markers giving
-# a paint-smudge-like effect.
-create_and_save_design(
-    collatz_iterations,
-    9,
-    PATTERN_SHIFT_1 + PATTERN_SHIFT_2 + PATTERN_SHIFT_3,
-    ((13000, 19000), (10, 80)),
-    BACKGROUND_COL_1,
-    FOREGOUND_COLOURS_1,
-    "4",
-    18,
-    0.4,
-)
 
+def attach_shared_sequence(shm_name, length):
+    """Attach a worker process to the shared sequence buffer."""
+    global shared_seq_memory, shared_seq
+    shared_seq_memory = shared_memory.SharedMemory(name=shm_name)
+    shared_seq = np.ndarray(
+        (length,), dtype=np.int64, buffer=shared_seq_memory.buf
+    )
+
+
+def render_design_from_shared_sequence(design):
+    """Create and save a design in a worker from the shared sequence."""
+    index, pattern_shifts, xy_limits, background_col, colours = design[:5]
+    create_and_save_design(
+        shared_seq,
+        index,
+        pattern_shifts,
+        xy_limits,
+        background_col,
+        iter(colours),
+        *design[5:],
+    )
+    plt.close("all")
+
+    return index
+
+
+def render_designs_in_parallel(seq, designs, processes=None):
+    """Create and save designs using a pool of worker processes.
+
+    The sequence is computed once by the caller and published to the
+    workers through shared memory rather than being copied to each job.
+    The foreground colour cycles are shared between designs, so they are
+    advanced here in the order the designs would be run sequentially to
+    give each job its explicit colour sequence, such that the outputs are
+    the same regardless of the order the workers complete the jobs in.
+
+    """
+    jobs = []
+    for design in designs:
+        pattern_shifts, foreground_cols = design[1], design[4]
+        colours = [next(foreground_cols) for _ in pattern_shifts]
+        jobs.append(design[:4] + (colours,) + design[5:])
+
+    seq = np.asarray(seq, dtype=np.int64)
+    shm = shared_memory.SharedMemory(create=True, size=seq.nbytes)
+    try:
+        np.ndarray(seq.shape, dtype=seq.dtype, buffer=shm.buf)[:] = seq
+        with Pool(
+            processes,
+            initializer=attach_shared_sequence,
+            initargs=(shm.name, len(seq)),
+        ) as pool:
+            for index in pool.imap_unordered(
+                render_design_from_shared_sequence, jobs
+            ):
+                print(f"Saved Collatz design {index}")
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+if __name__ == "__main__":
+    # For efficiency, calculate this only once, to re-use, since it is static.
+    collatz_iterations = np.array(collatz())
+
+    if RENDER_IN_PARALLEL:
+        render_designs_in_parallel(
+            collatz_iterations, DESIGNS, processes=PARALLEL_PROCESSES
+        )
+    else:
+        for design in DESIGNS:
+            create_and_save_design(collatz_iterations, *design)
+
+    # Zoom animation: from the full plot range into the window of design 1.
+    if CREATE_ZOOM_ANIMATION:
+        create_and_save_zoom_animation(
+            collatz_iterations,
+            "window_1",
+            PATTERN_SHIFT_1,
+            WINDOW_1,
+            BACKGROUND_COL_1,
+            FOREGOUND_COLOURS_1,
+            "v",
+            8,
+            0.05,
+        )
 
-plt.show()
+    plt.show()
@@ -1,8 +1,20 @@
 """Original designs for contours on gradient backgrounds."""
 
 
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+from itertools import product
+from multiprocessing import Pool
+import os
+import threading
+import time
+
 import numpy as np
+from matplotlib.contour import ContourSet
+from matplotlib.figure import Figure
+from matplotlib.path import Path
 import matplotlib.pyplot as plt
+import matplotlib.ticker as ticker
 
 
 """ Define data for all contour-on-gradient designs in a single dictionary.
@@ -218,53 +230,1238 @@ DESIGNS = {
 }
 
 
-# Define a chosen design to plot and unpack its data to use.
-design_choice = "6_lattice"
-(
-    contour_function,
-    background_function,
-    grid_resolution,
-    axes_limits,
+def get_contour_value_range(z):
+    """Return the minimum and maximum of the finite values of a field."""
+    z = np.ma.masked_invalid(z)
+    return float(z.min()), float(z.max())
+
+
+def get_contour_levels(z_min, z_max):
+    """Return the contour levels matplotlib would choose for a value range.
+
+    This follows the default for 'plt.contour', namely up to eight levels
+    from a 'MaxNLocator' spanning the range of finite values, trimmed to
+    one level either side of the range.
+
+    """
+    levels = ticker.MaxNLocator(8, min_n_ticks=1).tick_values(z_min, z_max)
+
+    under = np.nonzero(levels < z_min)[0]
+    start = under[-1] if len(under) else 0
+    over = np.nonzero(levels > z_max)[0]
+    stop = over[0] + 1 if len(over) else len(levels)
+    if stop - start < 3:
+        start, stop = 0, len(levels)
+
+    return levels[start:stop]
+
+
+def crop_grid_vectors(x_vector, y_vector, view_limits, margin=2):
+    """Return the parts of the grid vectors covering the view limits.
+
+    The parts are slices of the given vectors, so are the same points
+    and views onto the same data, extended past the view limits by the
+    given number of points (where available) as a margin, so that any
+    contour through the view is traced through the same grid cells as
+    it would be for the full grid.
+
+    """
+    cropped = []
+    for vector, (view_min, view_max) in zip(
+        (x_vector, y_vector), (view_limits[:2], view_limits[-2:])
+    ):
+        start = np.searchsorted(vector, min(view_min, view_max), "right") - 1
+        stop = np.searchsorted(vector, max(view_min, view_max), "left") + 1
+        cropped.append(
+            vector[max(start - margin, 0) : min(stop + margin, len(vector))]
+        )
+
+    return tuple(cropped)
+
+
+def pad_view_limits(ax, view_limits, linewidth):
+    """Return view limits padded by half of a line width on the axes.
+
+    Lines ending within the padding could still be drawn over the view,
+    so must be traced as they are for the full grid. The axes must have
+    its limits and aspect set beforehand.
+
+    """
+    ax.apply_aspect()
+    axes_width = ax.get_position().width * ax.figure.get_size_inches()[0]
+    view_width = abs(view_limits[1] - view_limits[0])
+    padding = linewidth / 2 / 72 * view_width / axes_width
+
+    return (
+        min(view_limits[:2]) - padding,
+        max(view_limits[:2]) + padding,
+        min(view_limits[-2:]) - padding,
+        max(view_limits[-2:]) + padding,
+    )
+
+
+def get_background_pixel_vectors(
+    ax, dpi, grid_limits, view_limits, background_limits
+):
+    """Return points sampling the visible background at output pixels.
+
+    The background is stretched from the grid limits over the background
+    limits, so the points returned are in the units of the grid limits
+    (for evaluating the background function) while the extent returned
+    is the part of the background limits within the view limits (for
+    plotting), with one point per pixel of the axes saved at the given
+    DPI. The axes must have its limits and aspect set beforehand.
+
+    """
+    ax.apply_aspect()
+    axes_size = ax.get_position().size * ax.figure.get_size_inches() * dpi
+
+    vectors = []
+    extent = []
+    for grid, view, background, pixels in zip(
+        (grid_limits[:2], grid_limits[-2:]),
+        (view_limits[:2], view_limits[-2:]),
+        (background_limits[:2], background_limits[-2:]),
+        axes_size,
+    ):
+        visible_min = max(min(view), min(background))
+        visible_max = min(max(view), max(background))
+        view_size = max(view) - min(view)
+        number = max(
+            round(pixels * (visible_max - visible_min) / view_size), 1
+        )
+
+        # Sample at pixel centres, then map to the units of the grid.
+        edges = np.linspace(visible_min, visible_max, num=number + 1)
+        centres = (edges[:-1] + edges[1:]) / 2
+        vectors.append(
+            grid[0]
+            + (centres - background[0])
+            * (grid[1] - grid[0])
+            / (background[1] - background[0])
+        )
+        extent.extend((visible_min, visible_max))
+
+    return vectors[0], vectors[1], tuple(extent)
+
+
+def get_evaluation_dtype(design_name):
+    """Return the floating-point type to evaluate a design's functions in.
+
+    This is single precision if set, unless the design is one of those
+    whose contours depend on the precision, else double precision.
+
+    """
+    if (
+        single_precision_evaluation
+        and design_name not in DOUBLE_PRECISION_DESIGNS
+    ):
+        return np.dtype(np.float32)
+    return np.dtype(np.float64)
+
+
+def get_evaluation_errstate():
+    """Return the floating-point error handling to evaluate functions with.
+
+    In single precision any floating-point errors are ignored since the
+    resulting non-finite values are masked, else the defaults are kept.
+
+    """
+    if single_precision_evaluation:
+        return np.errstate(all="ignore")
+    return np.errstate()
+
+
+def is_within_colour_range(values, value_range, colourmap):
+    """Return whether the finite values are within a range of colours.
+
+    Values beyond the range by less than the step between the colours of
+    the colourmap are counted as within it, as they would share the colour
+    at its end anyway.
+
+    """
+    values = np.ma.masked_invalid(values)
+    step = (value_range[1] - value_range[0]) / plt.get_cmap(colourmap).N
+
+    return (
+        values.min() >= value_range[0] - step
+        and values.max() <= value_range[1] + step
+    )
+
+
+def evaluate_tile(function, x_vector, y_vector, values):
+    """Evaluate a function over the grid of the given vectors in place.
+
+    The function is evaluated in the precision of the output array, given
+    a row and a column of the grid which broadcast together rather than a
+    meshgrid, so any parts of it depending on only one of them are only
+    evaluated once per column or row, and, besides the output, memory use
+    depends only on the size of the tile and not on the size of the grid.
+
+    """
+    with get_evaluation_errstate():
+        values[...] = function(
+            x_vector.astype(values.dtype, copy=False)[np.newaxis, :],
+            y_vector.astype(values.dtype, copy=False)[:, np.newaxis],
+        )
+
+
+def submit_tiles(executor, function, x_vector, y_vector, dtype):
+    """Submit evaluation of a function over a grid in tiles of rows.
+
+    Returns the output array for the grid, of the given floating-point
+    type, which is filled in as each tile
+    is evaluated, and the futures for the tiles, which must complete before
+    it is used. The tiles are blocks of rows of around the evaluation block
+    size, so depend only on the width of the grid, and each point is
+    evaluated independently, so the output does not depend on the number of
+    threads evaluating the tiles.
+
+    """
+    values = np.empty((len(y_vector), len(x_vector)), dtype)
+    rows = max(evaluation_block_size // len(x_vector), 1)
+    futures = [
+        executor.submit(
+            evaluate_tile,
+            function,
+            x_vector,
+            y_vector[start : start + rows],
+            values[start : start + rows],
+        )
+        for start in range(0, len(y_vector), rows)
+    ]
+
+    return values, futures
+
+
+def evaluate_over_grid(function, x_vector, y_vector, dtype):
+    """Evaluate a function over the grid of the given vectors."""
+    with ThreadPoolExecutor(evaluation_threads) as executor:
+        values, futures = submit_tiles(
+            executor, function, x_vector, y_vector, dtype
+        )
+        for future in futures:
+            future.result()
+
+    return values
+
+
+def find_cells_near_levels(corners, levels):
+    """Return a mask of grid cells which any of the given levels crosses.
+
+    The cells are given by the values at their corners, stacked along the
+    first axis. A level crosses a cell where it is within the range of the
+    finite values at the corners of the cell, and cells where only some of
+    the corner values are finite are included since their shapes are
+    unknown.
+
+    """
+    invalid = ~np.isfinite(corners)
+    corners = np.where(invalid, np.nan, corners)
+    low = np.fmin.reduce(corners)
+    high = np.fmax.reduce(corners)
+
+    crossed = np.searchsorted(levels, low, "left") != np.searchsorted(
+        levels, high, "right"
+    )
+    return crossed | (invalid.any(axis=0) & ~invalid.all(axis=0))
+
+
+def get_corner_indices(columns, rows, size, width):
+    """Return the grid indices of the corners of square grid cells.
+
+    The cells are given by the columns and rows of their lower left corners
+    on a grid of the given width, and the size of their sides in columns
+    and rows. The corners are stacked along the first axis in the order
+    lower left, lower right, upper left then upper right.
+
+    """
+    return (rows + np.array([[0], [0], [size], [size]])) * width + (
+        columns + np.array([[0], [size], [0], [size]])
+    )
+
+
+def trace_cells(level, x_vector, y_vector, columns, rows, size, corners):
+    """Return the segments of a contour level through square grid cells.
+
+    The level is traced through each of the cells by marching squares, from
+    the values at their corners, as from 'get_corner_indices', over the grid
+    of the given vectors. Where a level crosses all four sides of a cell,
+    the mean of its corner values decides which pairs of sides are joined,
+    and cells with any non-finite corner values are left out. Returns an
+    array of the start and end points of each segment, directed with the
+    higher values on its left, and an array of indices of the sides of the
+    cells they start and end on, which are shared with neighbouring cells.
+
+    """
+    above = corners > level
+    crossed = np.nonzero(
+        above.any(axis=0)
+        & ~above.all(axis=0)
+        & np.isfinite(corners).all(axis=0)
+    )[0]
+    above = above[:, crossed]
+
+    # The bottom, right, top and left sides run between these corners.
+    starts, ends = np.array([[0, 1, 2, 0], [1, 3, 3, 2]])
+    sides_crossed = above[starts] != above[ends]
+    crossings = sides_crossed.sum(axis=0)
+
+    # Join the two sides crossed, else two pairs of sides at a saddle.
+    single = np.nonzero(crossings == 2)[0]
+    cells = [single]
+    sides = [np.nonzero(sides_crossed[:, single].T)[1].reshape(-1, 2)]
+    saddle = np.nonzero(crossings == 4)[0]
+    centre_above = corners[:, crossed[saddle]].mean(axis=0) > level
+    joined = centre_above == above[0, saddle]
+    for pair, other_pair in ([0, 1], [0, 3]), ([3, 2], [1, 2]):
+        cells.append(saddle)
+        sides.append(np.where(joined[:, np.newaxis], pair, other_pair))
+    cells = np.concatenate(cells)
+    sides = np.concatenate(sides).T
+
+    # Going anticlockwise around a cell, a segment starts on the side where
+    # the values fall below the level and ends where they rise above it.
+    reverse = ~above[np.array([0, 1, 3, 2])[sides[0]], cells]
+    sides[:, reverse] = sides[::-1, reverse]
+
+    # Interpolate along each side between its corners, and index it by the
+    # grid index of its start doubled, plus one for the vertical sides.
+    cells = crossed[cells]
+    column_offsets, row_offsets = np.array(
+        [[0, size, 0, size], [0, 0, size, size]]
+    )
+    start_values = corners[starts[sides], cells]
+    fractions = (level - start_values) / (
+        corners[ends[sides], cells] - start_values
+    )
+    points = []
+    for vector, cell_indices, offsets in (
+        (x_vector, columns[cells], column_offsets),
+        (y_vector, rows[cells], row_offsets),
+    ):
+        start_points = vector[cell_indices + offsets[starts[sides]]]
+        end_points = vector[cell_indices + offsets[ends[sides]]]
+        points.append(start_points + fractions * (end_points - start_points))
+    side_indices = (
+        (rows[cells] + row_offsets[starts[sides]]) * len(x_vector)
+        + columns[cells]
+        + column_offsets[starts[sides]]
+    ) * 2 + sides % 2
+
+    return np.stack(points, axis=-1).transpose(1, 0, 2), side_indices.T
+
+
+def join_segments(segments, side_indices):
+    """Return the vertices and codes of the lines joining contour segments.
+
+    The segments are given with the indices of the sides they start and end
+    on, as from 'trace_cells', and each is followed by the segment starting
+    on the side it ends on. The lines are found by pointer jumping, to rank
+    the segments by their distance to the end of their line, after closed
+    lines are opened at their first segment, and closed lines are ended
+    with a CLOSEPOLY code as for 'ax.contour'.
+
+    """
+    count = len(segments)
+    order = np.argsort(side_indices[:, 0])
+    position = np.searchsorted(
+        side_indices[order, 0], side_indices[:, 1]
+    ).clip(max=count - 1)
+    following = np.where(
+        side_indices[order[position], 0] == side_indices[:, 1],
+        order[position],
+        -1,
+    )
+
+    # Jump along the lines to find the first segment of each closed line,
+    # until only closed lines are left and each segment has passed around
+    # all of its line, so has seen the same first segment as the next.
+    index = np.arange(count)
+    jump = following.copy()
+    first = index.copy()
+    active = index[following != -1]
+    while len(active):
+        target = jump[active]
+        target_first = first[target]
+        if (first[active] == target_first).all():
+            break
+        first[active] = np.minimum(first[active], target_first)
+        target = jump[target]
+        jump[active] = target
+        active = active[target != -1]
+    closed = active[first[active] == active]
+    preceding = np.full(count, -1)
+    preceding[following[following != -1]] = index[following != -1]
+    heads = preceding == -1
+    heads[closed] = True
+    opened = np.zeros(count, dtype=bool)
+    opened[preceding[closed]] = True
+    following[opened] = -1
+
+    # Jump along the opened lines to find their last segments and the
+    # distance of each segment from the last segment of its line.
+    jump = np.where(following == -1, index, following)
+    distance = (following != -1).astype(np.int64)
+    active = index[following != -1]
+    while len(active):
+        target = jump[active]
+        distance[active] += distance[target]
+        target = jump[target]
+        jump[active] = target
+        active = active[following[target] != -1]
+
+    # Each line is the start points of its segments then the end point of
+    # its last segment, so each segment starts back from the end by its
+    # distance from the last segment.
+    heads = np.nonzero(heads)[0]
+    lengths = distance[heads] + 1
+    ends = np.cumsum(lengths + 1) - 1
+    lines = np.empty(count, dtype=np.int64)
+    lines[jump[heads]] = np.arange(len(heads))
+    vertices = np.empty((count + len(heads), 2), dtype=segments.dtype)
+    vertices[ends[lines[jump]] - 1 - distance] = segments[:, 0]
+    vertices[ends] = segments[jump[heads], 1]
+    codes = np.full(len(vertices), Path.LINETO, dtype=Path.code_type)
+    codes[ends - lengths] = Path.MOVETO
+    codes[ends[opened[jump[heads]]]] = Path.CLOSEPOLY
+
+    return vertices, codes
+
+
+def sort_unique(indices):
+    """Return the sorted unique values of an array of grid indices.
+
+    The values are sorted and repeats dropped, which is much faster than
+    'np.unique' for the millions of indices of an adaptively refined grid.
+
+    """
+    indices = np.sort(indices)
+    return indices[np.concatenate(([True], indices[1:] != indices[:-1]))]
+
+
+def contour_adaptively(function, x_vector, y_vector, levels, depth, dtype):
+    """Return contours of a function traced over an adaptively refined grid.
+
+    The function is evaluated over the coarse grid of the given vectors,
+    then the cells crossed by a contour level, with the cells around them
+    for contours around features smaller than a cell, are split into four
+    the given number of times, evaluating the function only at the new
+    corners. The contours are traced through the final cells, which only
+    cover a band around the contours, so are as for a uniform grid of the
+    final spacing for a fraction of its evaluations. If no levels are given
+    they are chosen from the values over the coarse grid. Returns the
+    levels and the vertices and codes of the contours at each, as from
+    'load_contour_geometry'.
+
+    """
+    scale = 2 ** depth
+    x_vector = np.linspace(
+        x_vector[0], x_vector[-1], num=(len(x_vector) - 1) * scale + 1
+    )
+    y_vector = np.linspace(
+        y_vector[0], y_vector[-1], num=(len(y_vector) - 1) * scale + 1
+    )
+    width = len(x_vector)
+
+    # The values are kept for each point evaluated in order of its index
+    # in the final grid, so that they can be looked up by a binary search.
+    values = evaluate_over_grid(
+        function, x_vector[::scale], y_vector[::scale], dtype
+    ).ravel()
+    if levels is None:
+        levels = get_contour_levels(*get_contour_value_range(values))
+    columns, rows = np.meshgrid(
+        np.arange(0, width, scale), np.arange(0, len(y_vector), scale)
+    )
+    indices = (rows * width + columns).ravel()
+    columns, rows = np.meshgrid(
+        np.arange(0, width - 1, scale), np.arange(0, len(y_vector) - 1, scale)
+    )
+    columns, rows = columns.ravel(), rows.ravel()
+
+    size = scale
+    for _ in range(depth):
+        near = find_cells_near_levels(
+            values[
+                np.searchsorted(
+                    indices, get_corner_indices(columns, rows, size, width)
+                )
+            ],
+            levels,
+        )
+
+        # Split the cells near the levels, and the cells around them.
+        split = []
+        for column_offset, row_offset in product((-size, 0, size), repeat=2):
+            split_columns = columns[near] + column_offset
+            split_rows = rows[near] + row_offset
+            inside = (
+                (split_columns >= 0)
+                & (split_columns < width - 1)
+                & (split_rows >= 0)
+                & (split_rows < len(y_vector) - 1)
+            )
+            split.append(split_rows[inside] * width + split_columns[inside])
+        rows, columns = np.divmod(sort_unique(np.concatenate(split)), width)
+        size //= 2
+        columns = np.concatenate((columns, columns + size) * 2)
+        rows = np.concatenate((rows, rows, rows + size, rows + size))
+
+        # Evaluate the function only at new corners of the split cells.
+        new = sort_unique(
+            get_corner_indices(columns, rows, size, width).ravel()
+        )
+        positions = np.searchsorted(indices, new)
+        new = new[indices[positions.clip(max=len(indices) - 1)] != new]
+        positions = np.searchsorted(indices, new)
+        with get_evaluation_errstate():
+            new_values = function(
+                x_vector[new % width].astype(dtype),
+                y_vector[new // width].astype(dtype),
+            )
+        indices = np.insert(indices, positions, new)
+        values = np.insert(
+            values,
+            positions,
+            np.broadcast_to(new_values, new.shape).astype(dtype),
+        )
+
+    corners = values[
+        np.searchsorted(
+            indices, get_corner_indices(columns, rows, size, width)
+        )
+    ]
+    low = corners.min(axis=0)
+    high = corners.max(axis=0)
+    all_vertices = []
+    all_codes = []
+    for level in levels:
+        crossed = (low <= level) & (high > level)
+        vertices, codes = join_segments(
+            *trace_cells(
+                level,
+                x_vector,
+                y_vector,
+                columns[crossed],
+                rows[crossed],
+                size,
+                corners[:, crossed],
+            )
+        )
+        all_vertices.append([vertices])
+        all_codes.append([codes])
+
+    return levels, all_vertices, all_codes
+
+
+def get_contour_cache_key(function, *parameters):
+    """Return a key identifying the contours of a function over a grid.
+
+    The function is identified by its bytecode with the constants and the
+    names it uses, so the key changes when the function does, and the grid
+    by the given parameters, which must have a stable representation.
+
+    """
+    code = function.__code__
+    key = hashlib.sha256(code.co_code)
+    key.update(repr((code.co_consts, code.co_names, parameters)).encode())
+
+    return key.hexdigest()
+
+
+def save_contour_geometry(contours, cache_path):
+    """Save the levels and paths of a set of contours to a cache file."""
+    arrays = {"levels": contours.levels}
+    for index, path in enumerate(contours.get_paths()):
+        arrays[f"vertices_{index}"] = path.vertices
+        if path.codes is not None:
+            arrays[f"codes_{index}"] = path.codes
+
+    np.savez(cache_path, **arrays)
+
+
+def load_contour_geometry(cache_path):
+    """Return the levels, vertices and codes of contours in a cache file."""
+    with np.load(cache_path) as cache:
+        levels = cache["levels"]
+        all_vertices = [[cache[f"vertices_{i}"]] for i in range(len(levels))]
+        all_codes = [
+            [cache[f"codes_{i}"] if f"codes_{i}" in cache.files else None]
+            for i in range(len(levels))
+        ]
+
+    return levels, all_vertices, all_codes
+
+
+def get_value_range_cache_path(function, grid_limits, grid_resolution, dtype):
+    """Return the cache file for the range of a function over a meshgrid.
+
+    The file is keyed as for the contour geometry, by the function, the
+    meshgrid and the floating-point type it is evaluated in, so the range
+    is found again whenever any of them changes.
+
+    """
+    cache_key = get_contour_cache_key(
+        function, grid_limits, grid_resolution, dtype.name
+    )
+    return os.path.join(value_range_cache_dir, f"{cache_key}.npy")
+
+
+def get_grid_value_range(
+    function, grid_limits, grid_resolution, dtype, values=None
+):
+    """Return the range of finite values of a function over a meshgrid.
+
+    The range is read from its cache file, else is found from the given
+    values of the function over the full meshgrid, or by evaluating it if
+    none are given, and saved to the cache file.
+
+    """
+    cache_path = get_value_range_cache_path(
+        function, grid_limits, grid_resolution, dtype
+    )
+    if os.path.exists(cache_path):
+        return tuple(np.load(cache_path).tolist())
+
+    if values is None:
+        values = evaluate_over_grid(
+            function,
+            np.linspace(*grid_limits[:2], num=grid_resolution),
+            np.linspace(*grid_limits[-2:], num=grid_resolution),
+            dtype,
+        )
+    value_range = get_contour_value_range(values)
+
+    # Write to a temporary file first, as designs may be rendered at once.
+    os.makedirs(value_range_cache_dir, exist_ok=True)
+    temporary_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(temporary_path, "wb") as cache_file:
+        np.save(cache_file, value_range)
+    os.replace(temporary_path, cache_path)
+
+    return value_range
+
+
+# Set to True to evaluate the contour function only over the part of the
+# meshgrid that is within the view (with a margin) rather than all of it,
+# which gives the same contours within the view for much less evaluation
+# when the design is replotted. The contour levels are chosen from the range
+# of values over the full meshgrid, so the first time the design is plotted
+# the full meshgrid is still evaluated, to find that range, which is then
+# cached in the directory given for each function and meshgrid.
+crop_to_view = False
+value_range_cache_dir = "value_range_cache"
+
+# Set to True to evaluate the background function once per pixel of the
+# visible part of the background in the saved design, rather than over the
+# meshgrid of the contours, so the gradients are as smooth as the output
+# allows. The colours span the range of values over the meshgrid, as usual,
+# which is found once and cached as for cropping to the view. Where the pixels
+# sample values beyond that range, near a singular point of the background
+# function, e.g. along v = 0 for 5_circuitry, which would be clipped to the
+# ends of the colourmap, the meshgrid is used instead.
+background_at_output_resolution = False
+output_dpi = 1000
+
+# Define the number of points in each of the blocks of rows of the meshgrid
+# which the functions are evaluated over, sized so that the few arrays for
+# each block fit in the cache, where the blocks are shared between the given
+# number of threads, and the background and the contours are evaluated
+# concurrently.
+evaluation_block_size = 2 ** 14
+evaluation_threads = os.cpu_count()
+
+# Set to True to evaluate the functions in single rather than double precision,
+# which halves the memory for their values and is faster, ignoring the errors
+# from e.g. division by zero and masking the resulting non-finite values.
+# The designs listed below, whose contours depend on the precision (e.g. the
+# seams of 2_seams vanish in single precision), are always evaluated in double
+# precision, while those of the others move by less than a pixel, changing
+# under 1% of pixels at the edges of the lines.
+single_precision_evaluation = False
+DOUBLE_PRECISION_DESIGNS = {
+    "2_seams",
+    "3_star",
+    "8_jagged",
+    "9_ripples",
+    "12_cellular",
+}
+
+# Set to True to contour the designs listed below adaptively, from a meshgrid
+# coarser than theirs by the given factor, splitting only the cells near the
+# contour levels into four the given number of times, for contours as smooth
+# as for a much finer meshgrid from a fraction of its evaluations, which pays
+# off for contour functions that are costly to evaluate.
+refine_contours = False
+refinement_coarsening = 4
+REFINEMENT_DEPTHS = {"4_sweep": 5, "5_circuitry": 5, "12_cellular": 4}
+
+# Set to True to save the geometry of the contours of each design over its
+# full meshgrid to a file in the directory given, keyed by the contour
+# function, its meshgrid and the precision (and depth of any refinement), and
+# reuse it when the design is replotted, e.g. with a different style or view
+# within the meshgrid. The view is not cropped to while caching contours.
+cache_contours = False
+contour_cache_dir = "contour_cache"
+
+# Set to True to render all of the designs listed below, each in a worker
+# process, rather than only the chosen design, saving them to the directory
+# given. The time taken for each stage of each design is reported.
+render_all_designs = False
+designs_to_render = list(DESIGNS)
+render_dir = "designs"
+
+# Set to True to explore the chosen design rather than plot it, by moving the
+# view by each of the given pans (as fractions of the view size) and zooms (as
+# factors of the view size) in turn, with the given interval between moves.
+# A coarse preview of each view, of around the given number of samples across,
+# is saved to the directory given, then finer previews as it is refined in the
+# background up to the resolution of the design across the view, until the
+# view moves on. The function is evaluated over tiles of a lattice which are
+# kept, so only those newly exposed by a pan or zoom are evaluated.
+explore_chosen_design = False
+EXPLORATION_MOVES = [
+    (0.25, 0, 1),
+    (0.25, 0, 1),
+    (0, 0.25, 1),
+    (0, 0, 0.5),
+    (0, 0, 0.5),
+    (-0.25, -0.25, 1),
+    (0, 0, 4),
+]
+exploration_interval = 1.0
+exploration_resolution = 200
+exploration_tile_size = 64
+exploration_dpi = 100
+exploration_dir = "previews"
+
+
+def plot_design(design_name, save_path, fig=None):
+    """Plot and save a design, returning the time taken for each stage.
+
+    The design is plotted on the given figure, else on a new figure that
+    is independent of the pyplot global state. Times are returned, in
+    seconds, in a dictionary with keys for evaluation of the functions,
+    contouring and saving.
+
+    """
+    (
+        contour_function,
+        background_function,
+        grid_resolution,
+        axes_limits,
+        view_limits,
+        background_limits,
+        linewidth_parameters,
+        contour_colourmap,
+        background_colourmap,
+    ) = DESIGNS[design_name]
+    timings = {}
+    dtype = get_evaluation_dtype(design_name)
+
+    if fig is None:
+        fig = Figure()
+    ax = fig.add_subplot()
+
+    # Set the figure dimensions and hide the axes ticks and labels.
+    start = time.perf_counter()
+    x_vector = np.linspace(*axes_limits[:2], num=grid_resolution)
+    y_vector = np.linspace(*axes_limits[-2:], num=grid_resolution)
+
+    ax.set_xticks([])
+    ax.set_yticks([])
+    ax.axis(view_limits)
+    ax.set_aspect("equal")
+
+    # Evaluate the functions for the background and the contours.
+    #     (Note: 'RuntimeWarning: invalid value encountered in...' is raised
+    #      for certain designs where e.g. division by zero is encountered, but
+    #      this is mathematically inevitable and often important in the
+    #      resulting design.)
+    if background_at_output_resolution:
+        (
+            background_x,
+            background_y,
+            background_extent,
+        ) = get_background_pixel_vectors(
+            ax, output_dpi, axes_limits, view_limits, background_limits
+        )
+        background_range = get_grid_value_range(
+            background_function, axes_limits, grid_resolution, dtype
+        )
+    else:
+        background_x, background_y = x_vector, y_vector
+        background_extent = background_limits
+        background_range = (None, None)
+
+    refinement_depth = (
+        REFINEMENT_DEPTHS.get(design_name) if refine_contours else None
+    )
+
+    # The geometry of the contours is cached over the full meshgrid, so that
+    # it can be reused for any view within it.
+    cache_path = None
+    if cache_contours:
+        os.makedirs(contour_cache_dir, exist_ok=True)
+        cache_key = get_contour_cache_key(
+            contour_function,
+            axes_limits,
+            grid_resolution,
+            dtype.name,
+            refinement_depth,
+        )
+        cache_path = os.path.join(contour_cache_dir, f"{cache_key}.npz")
+    cached = cache_path is not None and os.path.exists(cache_path)
+    refined = refinement_depth is not None and not cached
+
+    # The levels depend on the values over the full meshgrid, so the view
+    # can only be cropped to once their range is cached, else the full
+    # meshgrid is evaluated as usual and its range is cached from it.
+    if (
+        crop_to_view
+        and not cache_contours
+        and os.path.exists(
+            get_value_range_cache_path(
+                contour_function, axes_limits, grid_resolution, dtype
+            )
+        )
+    ):
+        levels = get_contour_levels(
+            *get_grid_value_range(
+                contour_function, axes_limits, grid_resolution, dtype
+            )
+        )
+        contour_x, contour_y = crop_grid_vectors(
+            x_vector,
+            y_vector,
+            pad_view_limits(
+                ax, view_limits, max(np.arange(*linewidth_parameters))
+            ),
+        )
+    else:
+        levels = None
+        contour_x, contour_y = x_vector, y_vector
+
+    with ThreadPoolExecutor(evaluation_threads) as executor:
+        background, tiles = submit_tiles(
+            executor, background_function, background_x, background_y, dtype
+        )
+        if not cached and not refined:
+            contour_values, contour_tiles = submit_tiles(
+                executor, contour_function, contour_x, contour_y, dtype
+            )
+            tiles += contour_tiles
+        for tile in tiles:
+            tile.result()
+
+    if crop_to_view and levels is None and not cached and not refined:
+        get_grid_value_range(
+            contour_function,
+            axes_limits,
+            grid_resolution,
+            dtype,
+            contour_values,
+        )
+
+    # Where the pixels sample closer to a singular point of the background
+    # function than the meshgrid does, their values go beyond the range of
+    # the colours over the meshgrid, so would be clipped to the ends of the
+    # colourmap, so the background is evaluated over the meshgrid instead.
+    if background_at_output_resolution and not is_within_colour_range(
+        background, background_range, background_colourmap
+    ):
+        background = evaluate_over_grid(
+            background_function, x_vector, y_vector, dtype
+        )
+        background_extent = background_limits
+
+    # The contours are traced from a coarser meshgrid, so without a cached
+    # range their levels are chosen from the values over it instead, and no
+    # range is cached from it.
+    if refined:
+        contour_geometry = contour_adaptively(
+            contour_function,
+            np.linspace(
+                contour_x[0],
+                contour_x[-1],
+                num=(len(contour_x) - 1) // refinement_coarsening + 1,
+            ),
+            np.linspace(
+                contour_y[0],
+                contour_y[-1],
+                num=(len(contour_y) - 1) // refinement_coarsening + 1,
+            ),
+            levels,
+            refinement_depth,
+            dtype,
+        )
+    timings["evaluation"] = time.perf_counter() - start
+
+    # Plot the background and then the contours on top of the background.
+    start = time.perf_counter()
+    ax.imshow(
+        background,
+        extent=background_extent,
+        vmin=background_range[0],
+        vmax=background_range[1],
+        interpolation="bilinear",
+        origin="lower",
+        cmap=background_colourmap,
+    )
+    if cached or refined:
+        if cached:
+            contour_geometry = load_contour_geometry(cache_path)
+        contours = ContourSet(
+            ax,
+            *contour_geometry,
+            linewidths=np.arange(*linewidth_parameters),
+            cmap=contour_colourmap,
+        )
+        if refined and cache_path is not None:
+            save_contour_geometry(contours, cache_path)
+    else:
+        if single_precision_evaluation:
+            contour_values = np.ma.masked_invalid(contour_values, copy=False)
+        contours = ax.contour(
+            contour_x,
+            contour_y,
+            contour_values,
+            levels=levels,
+            linewidths=np.arange(*linewidth_parameters),
+            cmap=contour_colourmap,
+        )
+        if cache_path is not None:
+            save_contour_geometry(contours, cache_path)
+    timings["contouring"] = time.perf_counter() - start
+
+    # Save the overall figure i.e. the full design in high resolution.
+    start = time.perf_counter()
+    fig.savefig(save_path, format="png", bbox_inches="tight", dpi=output_dpi)
+    timings["saving"] = time.perf_counter() - start
+
+    return timings
+
+
+def render_design(design_name):
+    """Render a design to the render directory, returning its timings."""
+    return design_name, plot_design(
+        design_name, os.path.join(render_dir, f"{design_name}.png")
+    )
+
+
+def set_evaluation_threads(threads):
+    """Set the number of threads to evaluate functions with in a process."""
+    global evaluation_threads
+    evaluation_threads = threads
+
+
+def render_designs(design_names, processes=None):
+    """Render designs across a pool of worker processes.
+
+    Each design is plotted on a new figure in a worker process. The CPUs
+    are split between the processes, so each evaluates its functions with
+    a share of them as threads, by default one process per design up to
+    one per CPU. The time taken for each stage of each design is reported
+    as they complete.
+
+    """
+    cpus = os.cpu_count()
+    if processes is None:
+        processes = min(len(design_names), cpus)
+    threads = max(cpus // processes, 1)
+
+    os.makedirs(render_dir, exist_ok=True)
+    with Pool(
+        processes, initializer=set_evaluation_threads, initargs=(threads,)
+    ) as pool:
+        for design_name, timings in pool.imap_unordered(
+            render_design, design_names
+        ):
+            print(
+                f"{design_name}: "
+                + ", ".join(
+                    f"{stage} {seconds:.2f}s"
+                    for stage, seconds in timings.items()
+                )
+            )
+
+
+def move_view(view_limits, pan_x, pan_y, zoom):
+    """Return view limits panned and then zoomed about their centre."""
+    x_min, x_max, y_min, y_max = view_limits
+    x_centre = (x_min + x_max) / 2 + pan_x * (x_max - x_min)
+    y_centre = (y_min + y_max) / 2 + pan_y * (y_max - y_min)
+    x_half = zoom * (x_max - x_min) / 2
+    y_half = zoom * (y_max - y_min) / 2
+
+    return (
+        x_centre - x_half,
+        x_centre + x_half,
+        y_centre - y_half,
+        y_centre + y_half,
+    )
+
+
+def get_lattice_spacing(view_limits, resolution):
+    """Return the power of two spacing giving a view about a resolution.
+
+    Snapping the spacing to a power of two means views of similar sizes
+    share the same lattice, so tiles of it can be reused between them.
+
+    """
+    view_size = max(
+        view_limits[1] - view_limits[0], view_limits[3] - view_limits[2]
+    )
+    return 2.0 ** np.floor(np.log2(view_size / resolution))
+
+
+def evaluate_lattice(
+    function, spacing, limits, tile_cache, dtype, cancelled=None
+):
+    """Evaluate a function over the tiles of a lattice covering some limits.
+
+    The lattice has points at integer multiples of the spacing, grouped into
+    square tiles, and any tiles already in the given cache are reused rather
+    than evaluated. Returns the grid vectors and values over the tiles, of
+    the given floating-point type, and the number of tiles evaluated, or
+    None if cancelled by the given event.
+
+    """
+    size = exploration_tile_size
+    tile_span = size * spacing
+    columns = range(
+        int(np.floor(limits[0] / tile_span)),
+        int(np.floor(limits[1] / tile_span)) + 1,
+    )
+    rows = range(
+        int(np.floor(limits[2] / tile_span)),
+        int(np.floor(limits[3] / tile_span)) + 1,
+    )
+
+    values = np.empty((len(rows) * size, len(columns) * size), dtype)
+    evaluated = 0
+    for (row_index, row), (column_index, column) in product(
+        enumerate(rows), enumerate(columns)
+    ):
+        if cancelled is not None and cancelled.is_set():
+            return None
+
+        key = (spacing, column, row)
+        if key not in tile_cache:
+            tile = np.empty((size, size), dtype)
+            evaluate_tile(
+                function,
+                (column * size + np.arange(size)) * spacing,
+                (row * size + np.arange(size)) * spacing,
+                tile,
+            )
+            tile_cache[key] = tile
+            evaluated += 1
+        values[
+            row_index * size : (row_index + 1) * size,
+            column_index * size : (column_index + 1) * size,
+        ] = tile_cache[key]
+
+    x_vector = (columns[0] * size + np.arange(len(columns) * size)) * spacing
+    y_vector = (rows[0] * size + np.arange(len(rows) * size)) * spacing
+
+    return x_vector, y_vector, values, evaluated
+
+
+def save_preview(
+    design_name, view_limits, levels, background, contour_grid, save_path
+):
+    """Save a preview of a design over some view, with the given contours.
+
+    The background is given over the meshgrid of the design, and is plotted
+    over the background limits as for the design itself. The preview is
+    plotted on a new figure and is saved using Agg, so previews can be
+    saved from any thread.
+
+    """
+    (
+        *_,
+        background_limits,
+        linewidth_parameters,
+        contour_colourmap,
+        background_colourmap,
+    ) = DESIGNS[design_name]
+
+    fig = Figure()
+    ax = fig.add_subplot()
+    ax.set_xticks([])
+    ax.set_yticks([])
+    ax.axis(view_limits)
+    ax.set_aspect("equal")
+
+    ax.imshow(
+        background,
+        extent=background_limits,
+        interpolation="bilinear",
+        origin="lower",
+        cmap=background_colourmap,
+    )
+    x_vector, y_vector, values = contour_grid
+    if single_precision_evaluation:
+        values = np.ma.masked_invalid(values, copy=False)
+    ax.contour(
+        x_vector,
+        y_vector,
+        values,
+        levels=levels,
+        linewidths=np.arange(*linewidth_parameters),
+        cmap=contour_colourmap,
+    )
+    fig.savefig(
+        save_path, format="png", bbox_inches="tight", dpi=exploration_dpi
+    )
+
+
+def preview_view(
+    design_name,
+    view_index,
     view_limits,
-    background_limits,
-    linewidth_parameters,
-    contour_colourmap,
-    background_colourmap,
-) = DESIGNS[design_choice]
-
-# Set the figure dimensions and hide the axes ticks and labels.
-x, y = np.meshgrid(
-    np.linspace(*axes_limits[:2], num=grid_resolution),
-    np.linspace(*axes_limits[-2:], num=grid_resolution),
-)
-
-plt.xticks([])
-plt.yticks([])
-plt.axis(view_limits)
-
-# Plot the background.
-plt.imshow(
-    background_function(x, y),
-    extent=background_limits,
-    interpolation="bilinear",
-    origin="lower",
-    cmap=background_colourmap,
-)
-
-# Plot the contours on top of the background.
-#     (Note: 'RuntimeWarning: invalid value encountered in...' is raised for
-#      certain designs where e.g. division by zero is encountered, but this is
-#      mathematically inevitable and often important in the resulting design.)
-plt.contour(
-    x,
-    y,
-    contour_function(x, y),
-    linewidths=np.arange(*linewidth_parameters),
-    cmap=contour_colourmap,
-)
-
-# Save and display the overall figure i.e. the full design in high resolution.
-plt.savefig(
-    "%s.png" % design_choice, format="png", bbox_inches="tight", dpi=1000
-)
-plt.show()
+    levels,
+    background,
+    tile_cache,
+    stages,
+    cancelled,
+):
+    """Save previews of a view at each of the given stages of refinement.
+
+    Stops, without saving any more previews, when the given event is set,
+    i.e. when the view has moved on so that the previews are stale.
+
+    """
+    contour_function = DESIGNS[design_name][0]
+    spacing = get_lattice_spacing(view_limits, exploration_resolution)
+
+    for stage in stages:
+        lattice = evaluate_lattice(
+            contour_function,
+            spacing / 2 ** stage,
+            view_limits,
+            tile_cache,
+            get_evaluation_dtype(design_name),
+            cancelled,
+        )
+        # The view may have moved on while the last tiles were evaluated.
+        if lattice is None or cancelled is not None and cancelled.is_set():
+            return
+        *contour_grid, evaluated = lattice
+
+        save_path = os.path.join(
+            exploration_dir,
+            f"{design_name}_view_{view_index}_stage_{stage}.png",
+        )
+        save_preview(
+            design_name,
+            view_limits,
+            levels,
+            background,
+            contour_grid,
+            save_path,
+        )
+        print(
+            f"View {view_index}, stage {stage}: evaluated {evaluated} new "
+            f"tiles, saved '{save_path}'"
+        )
+
+
+def explore_design(design_name, moves):
+    """Explore a design by moving its view, saving progressive previews.
+
+    For each view, a coarse preview is saved straight away and then finer
+    previews are saved by a background thread, up to the resolution of the
+    design across the view, where any refinement of a previous view which
+    is still in progress is cancelled first.
+
+    """
+    (
+        contour_function,
+        background_function,
+        grid_resolution,
+        axes_limits,
+        view_limits,
+        *_,
+    ) = DESIGNS[design_name]
+    dtype = get_evaluation_dtype(design_name)
+
+    # The background and the contour levels do not depend on the view, so
+    # are found once over the meshgrid of the design.
+    x_vector = np.linspace(*axes_limits[:2], num=grid_resolution)
+    y_vector = np.linspace(*axes_limits[-2:], num=grid_resolution)
+    background = evaluate_over_grid(
+        background_function, x_vector, y_vector, dtype
+    )
+    levels = get_contour_levels(
+        *get_grid_value_range(
+            contour_function, axes_limits, grid_resolution, dtype
+        )
+    )
+
+    os.makedirs(exploration_dir, exist_ok=True)
+    tile_cache = {}
+    cancelled = threading.Event()
+    refinements = []
+    with ThreadPoolExecutor(1) as refiner:
+        for view_index, move in enumerate([None] + list(moves)):
+            cancelled.set()
+            cancelled = threading.Event()
+            if move is not None:
+                view_limits = move_view(view_limits, *move)
+
+            preview_view(
+                design_name,
+                view_index,
+                view_limits,
+                levels,
+                background,
+                tile_cache,
+                [0],
+                None,
+            )
+
+            # Halve the spacing of the lattice until there are as many
+            # samples across the view as the resolution of the design.
+            final_stage = int(
+                np.ceil(
+                    np.log2(
+                        get_lattice_spacing(
+                            view_limits, exploration_resolution
+                        )
+                        / get_lattice_spacing(view_limits, grid_resolution)
+                    )
+                )
+            )
+            refinements.append(
+                refiner.submit(
+                    preview_view,
+                    design_name,
+                    view_index,
+                    view_limits,
+                    levels,
+                    background,
+                    tile_cache,
+                    range(1, final_stage + 1),
+                    cancelled,
+                )
+            )
+            time.sleep(exploration_interval)
+
+    for refinement in refinements:
+        refinement.result()
+
+
+if __name__ == "__main__":
+    # Define a chosen design to plot, then save and display (or explore) it.
+    design_choice = "6_lattice"
+
+    if render_all_designs:
+        render_designs(designs_to_render)
+    elif explore_chosen_design:
+        explore_design(design_choice, EXPLORATION_MOVES)
+    else:
+        plot_design(design_choice, "%s.png" % design_choice, plt.figure())
+        plt.show()
@@ -1,13 +1,17 @@
 """Original minimal designs based around nesting similar shapes."""
 
 
-from itertools import cycle
+from itertools import cycle, product
+import json
+from multiprocessing import Pool
 import os
-from random import random, choice
 
+import matplotlib.animation as animation
 import matplotlib.pyplot as plt
-import matplotlib.patches as mpatches
+import matplotlib.collections as mcollections
+import matplotlib.colors as mcolors
 
+import numpy as np
 from numpy import pi, sin, cos
 
 
@@ -20,9 +24,15 @@ outer_centre = (0.5, 0.5)
 size_ratio_of_next_inner_shape = 0.09  # 0.07 used for stage one
 # For the alternative designs as shown in the README gallery, instead set 0.03
 number_inner_shapes = 500
+# Inner shapes are only created down to the point where they would become
+# smaller than this size (centre to vertex) in pixels in the saved output
+minimum_shape_size_in_pixels = 0.5
 
 # For stage two i.e. 'edge descend', the main designs
 padding_factor_for_edge_descend = 0.35
+# Choose how the centres of the shapes change for stage two, where 1 gives
+# the main designs and 2 or 3 the variants shown in the README gallery
+change_centre_variant = 1
 
 # ... for the (cycling) colours of the shapes:
 background_colour = "black"
@@ -49,6 +59,9 @@ stage_two_colours = [
 stage_two_colour_selector = cycle(stage_two_colours)  # flake8 error skip?
 
 
+# ... resolution, in dots per inch, of the saved designs:
+output_dpi = 1000
+
 # ... directories to save designs into:
 first_level_dir = "img"  # second_level_dirs live separately under this dir
 second_level_dirs = [
@@ -61,6 +74,44 @@ second_level_dirs = [
 number_sides_to_plot_compound = [1, 4, 3, 5]  # 3 <-> 4 for overall symmetry
 number_sides_to_plot_as_single = number_sides_to_plot_compound + [7, 12]
 
+# Set to True to save each single design and its close-up from one figure,
+# generating the design only once and changing just the axis limits for the
+# close-up so that the two views show the same design, or False to generate
+# each close-up as a new design on a separate figure
+closeups_from_same_design = True
+
+# Set to True to also run a sweep over the parameter values below, rendering
+# a design per parameter set, with every combination of values used if the
+# sample size is None, otherwise that number of randomly chosen combinations
+run_parameter_sweep = False
+sweep_parameters = {
+    "sides": number_sides_to_plot_as_single,
+    "size_ratio_of_next_inner_shape": [0.03, 0.07, 0.09],
+    "padding_factor_for_edge_descend": [0.2, 0.35, 0.5],
+    "colours": [
+        stage_one_colours,
+        stage_two_colours,
+        ["black", "peru", "darkslategrey", "goldenrod", "teal", "wheat"],
+    ],
+    "background_colour": ["black", "white"],
+}
+sweep_sample_size = None
+sweep_seed = 0
+sweep_dir = "sweep"
+sweep_dpi = 100
+sweep_contact_sheet_columns = 10
+
+# Set to True to also create an animation zooming continuously down through
+# the nested shapes of a design with the given number of sides, where the
+# view size is relative to the size of the shape currently being zoomed to
+create_descent_animation = False
+descent_animation_sides = 4
+descent_animation_frames = 600
+descent_animation_shapes_per_frame = 0.1
+descent_animation_view_size = 0.5
+descent_animation_fps = 30
+descent_animation_dpi = 200
+
 # ... with the (empirically determined) mapping to zoom in to achieve a
 # close-up on the container shape without any of the background showing.
 # Note that the higher the value, the less zoomed in, up to 0.5 which results
@@ -77,111 +128,377 @@ zoom_in_factors = {
 # -----------------------------------------
 
 
-def change_centre_variant_2(centre, index):
+def change_centre_variant_2(centre, number_shapes):
     """Variant of 'change_centre' function to generate '-2' designs.
 
-    Note the 'index' should be added as an input to change_centre in
-    this case to reflect the signature here.
+    Each centre is shifted along the diagonal from the last by an amount
+    growing with the index of the shape, so the offsets are cumulative
+    sums of the indices.
 
     """
-    identical_coor_val = centre[0] + 0.0008 * index
-    return (identical_coor_val, identical_coor_val)
+    shifts = 0.0008 * np.cumsum(np.arange(number_shapes))
+    identical_coor_vals = centre[0] + shifts
+    return np.column_stack((identical_coor_vals, identical_coor_vals))
 
 
-def change_centre_variant_3(centre):
-    """Variant of 'change_centre' function to generate '-3' designs."""
-    return (centre[0] * 0.99, centre[1] * 0.96)
+def change_centre_variant_3(centre, number_shapes):
+    """Variant of 'change_centre' function to generate '-3' designs.
 
+    Each centre is scaled from the last by a fixed factor per axis, so the
+    scale factors are cumulative products of those.
 
-def change_centre(centre, sides, new_size, old_size):
-    """Used to generate the main, 'edge descend', designs.
+    """
+    scale_factors = np.cumprod(
+        np.tile((0.99, 0.96), (number_shapes, 1)), axis=0
+    )
+    return np.asarray(centre) * scale_factors
 
-    Note 'new_size' and 'old_size' should be added as an input to
-    'change_centre' in this case to reflect the signature here.
+
+def draw_shift_angles(rng, sides, number_shapes):
+    """Return random angles to shift the centres of all inner shapes by.
+
+    All of the angles are drawn from the given numpy random Generator in
+    one call, as an array with an angle (in radians) per inner shape.
 
     """
-    change_in_size = new_size - old_size
-    move_centre_by = change_in_size * (1 - padding_factor_for_edge_descend)
     if sides == 1:  # For a circle, the *_size refers to the radii
         # Shift next circle in a random direction by the radius change
-        shift_angle_rads = 2 * pi * random()
+        return 2 * pi * rng.random(number_shapes)
     else:  # is a RegularPolygon where *_size is distance centre-vertex
         # Possible shift directions are discretised with the number of sides:
-        possible_shift_rads = [(2 * pi * N) / sides for N in range(sides)]
-        shift_angle_rads = choice(possible_shift_rads)
+        return 2 * pi * rng.integers(sides, size=number_shapes) / sides
+
+
+def change_centre(
+    centre,
+    new_sizes,
+    old_sizes,
+    shift_angle_rads,
+    padding_factor=padding_factor_for_edge_descend,
+):
+    """Used to generate the main, 'edge descend', designs.
+
+    Each centre is moved from the last by the change in size between the
+    shapes, less some padding, in the direction of the corresponding
+    angle from 'draw_shift_angles', so the centres are cumulative sums of
+    those moves.
 
-    new_centre = (
-        centre[0] + move_centre_by * cos(shift_angle_rads),
-        centre[1] + move_centre_by * sin(shift_angle_rads),
+    """
+    change_in_sizes = new_sizes - old_sizes
+    move_centre_by = change_in_sizes * (1 - padding_factor)
+    moves = move_centre_by[:, np.newaxis] * np.column_stack(
+        (cos(shift_angle_rads), sin(shift_angle_rads))
     )
-    return new_centre
+    return np.asarray(centre) + np.cumsum(moves, axis=0)
 
 
-def make_shape(
-    centre, size, sides=1, colour_selector=stage_one_colour_selector
-):
-    """Make and return a patch defining a positioned polygon to plot."""
+def get_polygon_vertices(centres, sizes, sides):
+    """Return the vertices of the regular polygons to plot for shapes.
+
+    The vertices are as for a RegularPolygon patch, with the first vertex
+    pointing upwards and the rest in anticlockwise order, computed for
+    every shape at once via broadcasting as an array of shape (number of
+    shapes, sides, 2). Triangles are adjusted as described inline.
+
+    """
+    if sides == 3:
+        # Make size larger else triangle looks a bit small in relation and
+        # also shift downwards to fit larger shape in the axes boundaries
+        sizes = sizes * 1.1
+        centres = centres - (0, 0.1)
+    vertex_rads = 2 * pi * np.arange(sides) / sides + pi / 2
+    unit_vertices = np.column_stack((cos(vertex_rads), sin(vertex_rads)))
+    return (
+        centres[:, np.newaxis, :]
+        + sizes[:, np.newaxis, np.newaxis] * unit_vertices
+    )
+
+
+def find_uncontained_shapes(centres, sizes, sides=1, tolerance=1e-9):
+    """Return indices of shapes not fully inside the shape before them.
+
+    Every shape is checked against its parent, the next largest shape,
+    at once. Circles are contained if the distance between the centres
+    plus the child radius is within the parent radius. Polygons, being
+    convex, are contained if all of the child vertices are on the inner
+    side of every edge of the parent, as found by the sign of the cross
+    product of the edge with the vector from its start to each vertex.
+    The 'tolerance' is relative to the size of the parent shape, on top of
+    which differences below the floating point resolution of the centre
+    coordinates are ignored, since deep into the descent the shapes can
+    become too small for their positions to be resolved relative to one
+    another.
+
+    """
+    resolution = 4 * np.finfo(float).eps * np.abs(centres).max(initial=1)
+    if sides == 1:
+        radii = sizes * 0.9  # as for the plotted circles, see 'make_shapes'
+        distances = np.hypot(*(centres[1:] - centres[:-1]).T)
+        contained = (
+            distances + radii[1:] <= radii[:-1] * (1 + tolerance) + resolution
+        )
+    else:
+        vertices = get_polygon_vertices(centres, sizes, sides)
+        parent_edge_starts = vertices[:-1]
+        parent_edges = np.roll(vertices[:-1], -1, axis=1) - parent_edge_starts
+        # Shape (number of pairs, child vertices, parent edges, 2):
+        to_child_vertices = (
+            vertices[1:, :, np.newaxis, :]
+            - parent_edge_starts[:, np.newaxis, :, :]
+        )
+        cross_products = (
+            parent_edges[:, np.newaxis, :, 0] * to_child_vertices[..., 1]
+            - parent_edges[:, np.newaxis, :, 1] * to_child_vertices[..., 0]
+        )
+        # Cross products scale with the square of the parent size, and
+        # the resolution is scaled by an upper bound on the edge length:
+        parent_sizes = sizes[:-1, np.newaxis, np.newaxis]
+        contained = np.all(
+            cross_products
+            >= -(tolerance * parent_sizes + 2 * resolution) * parent_sizes,
+            axis=(1, 2),
+        )
+
+    return np.flatnonzero(~contained) + 1
+
+
+def make_shapes(axes, centres, sizes, colours, sides=1):
+    """Make and return a collection defining positioned polygons to plot.
+
+    All of the shapes for a design are held in a single collection, which
+    draws them in the order given, so that order determines the layering.
+
+    """
     # Could take the (number of) sides -> infinity for sides of a regular
     # polygon to approximate a circle, but better to use actual circular
-    # matplotlib patch as a special case:
+    # matplotlib ellipses with equal axes as a special case:
     if sides == 1:
-        size *= 0.9  # make slightly smaller so relatively in size w/ polygons
-        return mpatches.Circle(centre, size, facecolor=next(colour_selector))
+        sizes = sizes * 0.9  # make slightly smaller so relative to polygons
+        return mcollections.EllipseCollection(
+            2 * sizes,
+            2 * sizes,
+            0,
+            units="xy",
+            offsets=centres,
+            offset_transform=axes.transData,
+            facecolors=colours,
+        )
     elif sides == 2:
         raise ValueError(
             "No two-sided regular polygon, choose another 'sides' value!"
         )
-    else:  # regular polygon patch of specified number of sides
-        if sides == 3:
-            # Make size larger else triangle looks a bit small in relation and
-            # also shift downwards to fit larger shape in the axes boundaries
-            size *= 1.1
-            centre_x, centre_y = centre
-            centre = centre_x, centre_y - 0.1
-        return mpatches.RegularPolygon(
-            centre, sides, size, facecolor=next(colour_selector)
+    else:  # regular polygon collection of specified number of sides
+        return mcollections.PolyCollection(
+            get_polygon_vertices(centres, sizes, sides), facecolors=colours
         )
 
 
-def make_design_patches(sides=1, reposition=False):
-    """Return the list of positioned patches defining the design."""
-    patch_layers = []
+def count_visible_inner_shapes(
+    axes, dpi=output_dpi, size_ratio=size_ratio_of_next_inner_shape
+):
+    """Return the number of inner shapes that are visible at a resolution.
+
+    Inner shapes shrink geometrically, so after some number of them they
+    are too small to register in the output. That number is found from
+    the size in pixels of a unit of the data at the given output dots per
+    inch, given the current axis limits of the axes the design is on.
 
-    use_centre = outer_centre  # fixed centre if reposition=False
+    """
+    axes.apply_aspect()
+    window = axes.get_window_extent()
+    pixel_scale = dpi / axes.figure.dpi
+    x_min, x_max = axes.get_xlim()
+    y_min, y_max = axes.get_ylim()
+    pixels_per_unit = pixel_scale * max(
+        window.width / abs(x_max - x_min), window.height / abs(y_max - y_min)
+    )
+
+    # Shape at index i has size outer_size * (1 - ratio) ** (i + 1):
+    smallest_size = minimum_shape_size_in_pixels / pixels_per_unit
+    if smallest_size >= outer_size:
+        return 0
+    visible = int(np.log(smallest_size / outer_size) / np.log(1 - size_ratio))
+    return min(visible, number_inner_shapes)
+
+
+def make_design_trajectory(
+    sides=1,
+    reposition=False,
+    number_shapes=number_inner_shapes,
+    rng=None,
+    size_ratio=size_ratio_of_next_inner_shape,
+    padding_factor=padding_factor_for_edge_descend,
+):
+    """Return the centres and sizes of the shapes in the design.
 
+    The whole descent is computed at once, where the sizes form a
+    geometric sequence and the centres are found from cumulative sums or
+    products depending on the 'change_centre_variant'. Any randomness is
+    drawn from 'rng', a numpy random Generator, which is seeded from fresh
+    entropy if not given.
+
+    """
+    sizes = outer_size * np.cumprod(np.full(number_shapes, 1 - size_ratio))
+
+    # Process centres for edge descend, else use fixed centre:
+    if not reposition:
+        centres = np.tile(outer_centre, (number_shapes, 1))
+    elif change_centre_variant == 2:
+        centres = change_centre_variant_2(outer_centre, number_shapes)
+    elif change_centre_variant == 3:
+        centres = change_centre_variant_3(outer_centre, number_shapes)
+    else:
+        if rng is None:
+            rng = np.random.default_rng()
+        old_sizes = np.concatenate(([outer_size], sizes[:-1]))
+        centres = change_centre(
+            outer_centre,
+            sizes,
+            old_sizes,
+            draw_shift_angles(rng, sides, number_shapes),
+            padding_factor,
+        )
+
+    return centres, sizes
+
+
+def make_design_patches(
+    sides=1,
+    reposition=False,
+    colour_selector=stage_one_colour_selector,
+    number_shapes=number_inner_shapes,
+    rng=None,
+):
+    """Return the centres, sizes and colours of the shapes in the design.
+
+    Each is an array with one item per shape, in order from the outermost
+    shape inwards, for the first 'number_shapes' of the inner shapes. See
+    'make_design_trajectory' for how the centres and sizes are generated.
+
+    """
     # zorder managed naturally via plotting largest first, if did in inverse
     # order would need to use zorder to stop larger shapes covering smaller.
-    new_size = outer_size
-    for index in range(number_inner_shapes):
-        if reposition:
-            old_size = new_size
-        new_size *= 1 - size_ratio_of_next_inner_shape
+    centres, sizes = make_design_trajectory(
+        sides=sides,
+        reposition=reposition,
+        number_shapes=number_shapes,
+        rng=rng,
+    )
+
+    # Always take colours for all of the inner shapes, even those which are
+    # not made, so the colour cycling is the same across designs regardless
+    colours = mcolors.to_rgba_array(
+        [next(colour_selector) for _ in range(number_inner_shapes)]
+    )[:number_shapes]
+
+    return centres, sizes, colours
+
+
+def create_design(axes, stage_two, sides=1, rng=None):
+    """Create a design by attaching a collection of all shapes to axes.
+
+    Only the shapes that are visible in the output are created, so the
+    axis limits should be set on the axes before this is called.
+
+    """
+    centres, sizes, colours = make_design_patches(
+        sides=sides,
+        reposition=stage_two,
+        number_shapes=count_visible_inner_shapes(axes),
+        rng=rng,
+    )
+    axes.add_collection(
+        make_shapes(axes, centres, sizes, colours, sides), autolim=False
+    )
 
-        # Process new centre for edge descend:
-        if reposition:
-            use_centre = change_centre(use_centre, sides, new_size, old_size)
 
-        new_patch = make_shape(use_centre, new_size, sides)
-        patch_layers.append(new_patch)
+def get_closeup_limits(sides):
+    """Return the axis limits to zoom in to a close-up of a design."""
+    zoom_in_factor = zoom_in_factors[sides]
+    zoom_in_vals = (0.5 - zoom_in_factor, 0.5 + zoom_in_factor)  # min, max
+    if sides == 3:
+        shifted_down_zoom_in_vals = (
+            0.405 - zoom_in_factor,
+            0.405 + zoom_in_factor,
+        )
+        zoom_in_vals = zoom_in_vals + shifted_down_zoom_in_vals
+    else:  # x and y axes min and max are the same
+        zoom_in_vals += zoom_in_vals
+
+    return zoom_in_vals
+
 
-    return patch_layers
+def get_output_directory(stage_two=True):
+    """Return the directory to save designs to, creating all if needed.
 
+    Close-ups are saved to the directory of the same name suffixed with
+    '-closeups'.
 
-def create_design(axes, stage_two, sides=1):
-    """Create a design by attaching all underlying patches to axes."""
-    for p in make_design_patches(sides=sides, reposition=stage_two):
-        axes.add_artist(p)
+    """
+    # Create dirs to store the output designs if they do not exist already
+    os.makedirs(f"{first_level_dir}", exist_ok=True)
+    for directory in second_level_dirs:
+        os.makedirs(f"{first_level_dir}/{directory}", exist_ok=True)
+        os.makedirs(f"{first_level_dir}/{directory}-closeups", exist_ok=True)
+
+    use_subdir = second_level_dirs[int(stage_two)]
+    return f"{first_level_dir}/{use_subdir}"
+
+
+def save_design_metadata(image_path, seed, sides, stage_two):
+    """Save the seed and parameters of a design alongside its image.
+
+    The metadata is written as JSON to a sidecar file with the same name
+    as the image but with a '.json' extension, so that the design can be
+    regenerated exactly by passing the recorded seed to plot it again.
+
+    """
+    metadata = {
+        "seed": seed,
+        "sides": sides,
+        "stage_two": stage_two,
+        "outer_size": outer_size,
+        "outer_centre": outer_centre,
+        "size_ratio_of_next_inner_shape": size_ratio_of_next_inner_shape,
+        "number_inner_shapes": number_inner_shapes,
+        "padding_factor_for_edge_descend": padding_factor_for_edge_descend,
+        "change_centre_variant": change_centre_variant,
+        "minimum_shape_size_in_pixels": minimum_shape_size_in_pixels,
+        "output_dpi": output_dpi,
+        "colours": stage_one_colours,
+    }
+    with open(f"{os.path.splitext(image_path)[0]}.json", "w") as f:
+        json.dump(metadata, f, indent=4)
 
 
 def plot_and_save(
-    use_number_of_sides=1, single=True, closeup=False, stage_two=True
+    use_number_of_sides=1,
+    single=True,
+    closeup=False,
+    stage_two=True,
+    seed=None,
 ):
-    """Plot and save a single or compound 'Edge Descend' design."""
+    """Plot and save a single or compound 'Edge Descend' design.
+
+    The design is generated from a random Generator seeded with 'seed',
+    or a new seed if that is not given, which is recorded in a metadata
+    file saved alongside the image.
+
+    """
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    rng = np.random.default_rng(seed)
+
     fig = plt.figure(figsize=(5, 5), facecolor=background_colour)
 
     if single:
         ax = fig.add_subplot(111, aspect="equal")
-        create_design(ax, sides=use_number_of_sides, stage_two=stage_two)
+        if closeup:
+            # Zoom in on single plots if requested
+            ax.axis(get_closeup_limits(use_number_of_sides))
+        create_design(
+            ax, sides=use_number_of_sides, stage_two=stage_two, rng=rng
+        )
     else:
         # Vary subplot_index prefix appropriate to len(use_number_of_sides)
         for i, set_sides in enumerate(use_number_of_sides):
@@ -189,7 +506,7 @@ def plot_and_save(
             ax = fig.add_subplot(subplot_index, subplot_index, i + 1)
             ax.set_facecolor(background_colour)
             ax.set_axis_off()
-            create_design(ax, sides=set_sides, stage_two=stage_two)
+            create_design(ax, sides=set_sides, stage_two=stage_two, rng=rng)
 
     plt.axis("off")
 
@@ -198,59 +515,394 @@ def plot_and_save(
     else:
         name_prefix = "compound_design"
 
-    # Create dirs to store the output designs if they do not exist already
-    os.makedirs(f"{first_level_dir}", exist_ok=True)
-    for directory in second_level_dirs:
-        os.makedirs(f"{first_level_dir}/{directory}", exist_ok=True)
-        os.makedirs(f"{first_level_dir}/{directory}-closeups", exist_ok=True)
-
-    # Now can plot, save and show the final single or compound design
-    use_subdir = second_level_dirs[int(stage_two)]
-    directory = f"{first_level_dir}/{use_subdir}"
+    directory = get_output_directory(stage_two)
 
     if closeup and single:
-        # Zoom in on single plots if requested
-        zoom_in_factor = zoom_in_factors[use_number_of_sides]
-        zoom_in_vals = (0.5 - zoom_in_factor, 0.5 + zoom_in_factor)  # min, max
-        if use_number_of_sides == 3:
-            shifted_down_zoom_in_vals = (
-                0.405 - zoom_in_factor,
-                0.405 + zoom_in_factor,
-            )
-            zoom_in_vals = zoom_in_vals + shifted_down_zoom_in_vals
-        else:  # x and y axes min and max are the same
-            zoom_in_vals += zoom_in_vals
-        ax.axis(zoom_in_vals)
-
         # For the alternative designs, add "_alt" to the end of the filename
         # before the extension to save to the dirs as in the savde repo state:
+        save_path = f"{directory}-closeups/{name_prefix}_closeup.png"
         plt.savefig(
-            f"{directory}-closeups/{name_prefix}_closeup.png",
+            save_path,
             format="png",
-            dpi=1000,
+            dpi=output_dpi,
             bbox_inches="tight",
         )
-        plt.show()
     else:
         #  For the alternative designs, add "_alt" (see above comment)
+        save_path = f"{directory}/{name_prefix}.png"
         plt.savefig(
-            f"{directory}/{name_prefix}.png",
+            save_path,
             format="png",
-            dpi=1000,
+            dpi=output_dpi,
+        )
+    save_design_metadata(save_path, seed, use_number_of_sides, stage_two)
+    plt.show()
+
+
+def plot_and_save_with_closeup(
+    use_number_of_sides=1, stage_two=True, seed=None
+):
+    """Plot and save a single design and a close-up of that same design.
+
+    The design is generated only once, with enough inner shapes to be
+    visible in the close-up, and then saved first in full and then again
+    after zooming in by setting the axis limits for the close-up. The
+    seed used is recorded as for 'plot_and_save'.
+
+    """
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    rng = np.random.default_rng(seed)
+
+    fig = plt.figure(figsize=(5, 5), facecolor=background_colour)
+    ax = fig.add_subplot(111, aspect="equal")
+
+    full_limits = ax.axis()
+    closeup_limits = get_closeup_limits(use_number_of_sides)
+    ax.axis(closeup_limits)
+    create_design(ax, sides=use_number_of_sides, stage_two=stage_two, rng=rng)
+    plt.axis("off")
+
+    name_prefix = f"single_design_with_{use_number_of_sides}_sides"
+    directory = get_output_directory(stage_two)
+
+    #  For the alternative designs, add "_alt" (see 'plot_and_save' comment)
+    ax.axis(full_limits)
+    save_path = f"{directory}/{name_prefix}.png"
+    plt.savefig(
+        save_path,
+        format="png",
+        dpi=output_dpi,
+    )
+    save_design_metadata(save_path, seed, use_number_of_sides, stage_two)
+
+    ax.axis(closeup_limits)
+    save_path = f"{directory}-closeups/{name_prefix}_closeup.png"
+    plt.savefig(
+        save_path,
+        format="png",
+        dpi=output_dpi,
+        bbox_inches="tight",
+    )
+    save_design_metadata(save_path, seed, use_number_of_sides, stage_two)
+    plt.show()
+
+
+def get_sweep_parameter_sets(parameters, sample_size=None, seed=None):
+    """Return the parameter sets to sweep over as a list of dictionaries.
+
+    Each set has a value for every parameter, taken from the sequence of
+    values given for it. All combinations of values are used unless a
+    'sample_size' is given, in which case that number of combinations are
+    chosen at random. Each set is also given a 'seed' for its design.
+
+    """
+    rng = np.random.default_rng(seed)
+    names = list(parameters)
+    combinations = list(product(*parameters.values()))
+    if sample_size is not None and sample_size < len(combinations):
+        chosen = rng.choice(len(combinations), sample_size, replace=False)
+        combinations = [combinations[index] for index in sorted(chosen)]
+
+    seeds = rng.integers(2 ** 32, size=len(combinations))
+    return [
+        {**dict(zip(names, values)), "seed": int(design_seed)}
+        for values, design_seed in zip(combinations, seeds)
+    ]
+
+
+def make_sweep_design_trajectory(parameter_set, number_shapes):
+    """Return the centres and sizes of a design from a sweep parameter set.
+
+    This is cheap relative to rendering, so can be used to filter out any
+    parameter sets giving unwanted geometry before they are rendered.
+
+    """
+    return make_design_trajectory(
+        sides=parameter_set["sides"],
+        reposition=True,
+        number_shapes=number_shapes,
+        rng=np.random.default_rng(parameter_set["seed"]),
+        size_ratio=parameter_set["size_ratio_of_next_inner_shape"],
+        padding_factor=parameter_set["padding_factor_for_edge_descend"],
+    )
+
+
+def render_sweep_design(parameter_set):
+    """Render and save a single 'edge descend' design of a sweep.
+
+    Intended to be run in a worker process, so it uses its own figure,
+    which is closed after saving, and takes colours only from the given
+    parameter set rather than any shared colour selector.
+
+    """
+    background = parameter_set["background_colour"]
+    fig = plt.figure(figsize=(5, 5), facecolor=background)
+    ax = fig.add_subplot(111, aspect="equal")
+    ax.set_axis_off()
+
+    number_shapes = count_visible_inner_shapes(
+        ax, sweep_dpi, parameter_set["size_ratio_of_next_inner_shape"]
+    )
+    centres, sizes = make_sweep_design_trajectory(parameter_set, number_shapes)
+    colour_cycle = mcolors.to_rgba_array(parameter_set["colours"])
+    colours = colour_cycle[np.arange(number_shapes) % len(colour_cycle)]
+    ax.add_collection(
+        make_shapes(ax, centres, sizes, colours, parameter_set["sides"]),
+        autolim=False,
+    )
+
+    fig.savefig(parameter_set["path"], format="png", dpi=sweep_dpi)
+    plt.close(fig)
+
+    return parameter_set["path"]
+
+
+def save_contact_sheet(image_paths, save_path, columns):
+    """Save a mosaic of images, in rows of the given number of columns.
+
+    The sheet is built as 8-bit RGBA and filled one image at a time, so
+    that only one image is held in memory alongside it, as the sweep may
+    produce hundreds of images.
+
+    """
+    shapes = [plt.imread(path).shape for path in image_paths]
+    height = max(shape[0] for shape in shapes)
+    width = max(shape[1] for shape in shapes)
+    rows = -(-len(image_paths) // columns)  # ceiling division
+
+    sheet = np.full((rows * height, columns * width, 4), 255, np.uint8)
+    for index, path in enumerate(image_paths):
+        image = plt.imread(path)
+        if image.dtype != np.uint8:
+            image = np.round(image * 255).astype(np.uint8)
+        row, column = divmod(index, columns)
+        sheet[
+            row * height : row * height + image.shape[0],
+            column * width : column * width + image.shape[1],
+            : image.shape[2],
+        ] = image
+    plt.imsave(save_path, sheet)
+
+
+def run_sweep(
+    parameter_sets,
+    directory=sweep_dir,
+    processes=None,
+    skip_uncontained=True,
+):
+    """Render designs for all parameter sets in parallel with a summary.
+
+    The geometry of each design is first generated, which is cheap, to
+    check that every shape is contained in its parent, skipping those
+    parameter sets which fail if 'skip_uncontained' is True. The rest are
+    rendered by a pool of worker processes into individual files and then
+    combined into a contact sheet, with an index of parameters per file.
+
+    """
+    os.makedirs(directory, exist_ok=True)
+
+    to_render = []
+    for index, parameter_set in enumerate(parameter_sets):
+        if skip_uncontained:
+            centres, sizes = make_sweep_design_trajectory(
+                parameter_set, number_inner_shapes
+            )
+            if find_uncontained_shapes(
+                centres, sizes, parameter_set["sides"]
+            ).size:
+                continue
+        path = os.path.join(directory, f"sweep_design_{index}.png")
+        to_render.append({**parameter_set, "path": path})
+
+    if not to_render:
+        return []
+
+    with Pool(processes) as pool:
+        image_paths = pool.map(render_sweep_design, to_render)
+
+    save_contact_sheet(
+        image_paths,
+        os.path.join(directory, "contact_sheet.png"),
+        sweep_contact_sheet_columns,
+    )
+    with open(os.path.join(directory, "sweep.json"), "w") as f:
+        json.dump(to_render, f, indent=4)
+
+    return image_paths
+
+
+def draw_descent_steps(
+    rng,
+    sides,
+    size_ratio=size_ratio_of_next_inner_shape,
+    padding_factor=padding_factor_for_edge_descend,
+    chunk_size=100,
+):
+    """Yield moves between the centres of successive shapes indefinitely.
+
+    Each move is relative to the size of the larger shape of the pair, as
+    for 'change_centre', so that the descent can be continued from any
+    shape in any units. Angles are drawn in chunks via 'draw_shift_angles'.
+
+    """
+    step_length = -size_ratio * (1 - padding_factor)
+    while True:
+        angles = draw_shift_angles(rng, sides, chunk_size)
+        yield from step_length * np.column_stack((cos(angles), sin(angles)))
+
+
+def create_and_save_descent_animation(
+    sides=descent_animation_sides,
+    seed=None,
+    frames=descent_animation_frames,
+):
+    """Animate a continuous zoom down through the shapes of a design.
+
+    The view is centred on a point moving between the centres of
+    successive shapes, shrinking with their sizes. Only the shapes that
+    can be seen are kept: inner shapes are generated lazily as they
+    become large enough to be visible and outer shapes are dropped once
+    a shape inside them covers the whole view. All of these are held in
+    units of the shape currently being zoomed to, so that the number of
+    shapes and the numerical precision stay the same however deep the
+    zoom goes. Frames are written to the video as they are drawn.
+
+    """
+    rng = np.random.default_rng(seed)
+    steps = draw_descent_steps(rng, sides)
+    colour_cycle = mcolors.to_rgba_array(stage_one_colours)
+    shrink_factor = 1 - size_ratio_of_next_inner_shape
+    if sides == 1:
+        inradius_factor = 0.9  # as for the plotted circles
+    else:
+        inradius_factor = cos(pi / sides)
+
+    fig = plt.figure(figsize=(5, 5), facecolor=background_colour)
+    ax = fig.add_axes([0, 0, 1, 1], aspect="equal")
+    ax.set_facecolor(background_colour)
+    ax.set_axis_off()
+    view_pixels = fig.get_figwidth() * descent_animation_dpi
+
+    # Shapes kept, from the outermost inwards, with their index in the
+    # descent, starting from just the outermost shape which is of unit size
+    centres = np.zeros((1, 2))
+    sizes = np.ones(1)
+    indices = np.zeros(1, dtype=int)
+    collection = None
+
+    def update_descent_frame(frame):
+        """Update the shapes kept and the view for a frame of the zoom."""
+        nonlocal centres, sizes, indices, collection
+        focus = frame * descent_animation_shapes_per_frame
+        focus_index = int(focus)
+        half_width = descent_animation_view_size * shrink_factor ** (
+            focus - focus_index
+        )
+        smallest_size = 2 * half_width * minimum_shape_size_in_pixels
+        smallest_size /= view_pixels
+
+        # Generate inner shapes until they are too small to be visible in
+        # the view, or at least to the next shape to zoom to
+        new_shapes = []
+        centre, size, index = centres[-1], sizes[-1], indices[-1]
+        while size * shrink_factor >= smallest_size or index <= focus_index:
+            centre = centre + size * next(steps)
+            size *= shrink_factor
+            index += 1
+            new_shapes.append((centre, size, index))
+        if new_shapes:
+            new_centres, new_sizes, new_indices = zip(*new_shapes)
+            centres = np.concatenate((centres, new_centres))
+            sizes = np.concatenate((sizes, new_sizes))
+            indices = np.concatenate((indices, new_indices))
+
+        # Re-express all in units of the shape being zoomed to, then move
+        # the view centre along towards the next shape
+        focus_position = np.searchsorted(indices, focus_index)
+        centres = (centres - centres[focus_position]) / sizes[focus_position]
+        sizes = sizes / sizes[focus_position]
+        view_centre = (focus - focus_index) * centres[focus_position + 1]
+
+        # Drop all shapes outside the last of the shapes, up to the one
+        # being zoomed to, with an inscribed circle containing the view
+        covers_view = (
+            np.hypot(*(centres - view_centre).T) + half_width * 2 ** 0.5
+            <= sizes * inradius_factor
+        )
+        covers_view[focus_position + 1 :] = False
+        if covers_view.any():
+            first_kept = np.flatnonzero(covers_view)[-1]
+            centres = centres[first_kept:]
+            sizes = sizes[first_kept:]
+            indices = indices[first_kept:]
+
+        if sides == 3:  # shift view as for the triangles, see 'make_shapes'
+            view_centre = view_centre - (0, 0.1)
+
+        if collection is not None:
+            collection.remove()
+        colours = colour_cycle[indices % len(colour_cycle)]
+        collection = make_shapes(ax, centres, sizes, colours, sides)
+        ax.add_collection(collection, autolim=False)
+        ax.set_xlim(view_centre[0] - half_width, view_centre[0] + half_width)
+        ax.set_ylim(view_centre[1] - half_width, view_centre[1] + half_width)
+
+        return [collection]
+
+    anim = animation.FuncAnimation(
+        fig,
+        update_descent_frame,
+        frames=frames,
+        cache_frame_data=False,
+    )
+    os.makedirs(first_level_dir, exist_ok=True)
+    anim.save(
+        f"{first_level_dir}/descent_animation_with_{sides}_sides.mp4",
+        writer=animation.FFMpegWriter(
+            fps=descent_animation_fps, extra_args=["-vcodec", "libx264"]
+        ),
+        dpi=descent_animation_dpi,
+        savefig_kwargs={"facecolor": background_colour},
+    )
+
+
+if __name__ == "__main__":
+    # Create and plot the designs from...
+    if closeups_from_same_design:
+        # ...generating each single design once for both views:
+        for number_sides in number_sides_to_plot_as_single:
+            plot_and_save_with_closeup(use_number_of_sides=number_sides)
+        plot_and_save(
+            single=False, use_number_of_sides=number_sides_to_plot_compound
+        )
+    else:
+        # ...without zooming in:
+        for number_sides in number_sides_to_plot_as_single:
+            plot_and_save(use_number_of_sides=number_sides)
+        plot_and_save(
+            single=False, use_number_of_sides=number_sides_to_plot_compound
+        )
+        # ... zooming in to create a close-up where the shapes fill the canvas:
+        for number_sides in number_sides_to_plot_as_single:
+            plot_and_save(use_number_of_sides=number_sides, closeup=True)
+
+    if run_parameter_sweep:
+        run_sweep(
+            get_sweep_parameter_sets(
+                sweep_parameters, sweep_sample_size, sweep_seed
+            )
         )
-        plt.show()
 
+    if create_descent_animation:
+        create_and_save_descent_animation()
 
-# Create and plot the designs from...
-# ...without zooming in:
-for number_sides in number_sides_to_plot_as_single:
-    plot_and_save(use_number_of_sides=number_sides)
-plot_and_save(single=False, use_number_of_sides=number_sides_to_plot_compound)
-# ... zooming in to create a close-up where the shapes fill the entire canvas:
-for number_sides in number_sides_to_plot_as_single:
-    plot_and_save(use_number_of_sides=number_sides, closeup=True)
 
-# TODO: fix triangular 'edge descend' case, where some inner triangles get
+# TODO: fix triangular 'edge descend' case, where inner triangles get
 # positioned slightly outside the previous larger triangle, but should be
-# fully contained. This doesn't seem to be related to the overall shifting
-# since it seems to happen even when the shifting is manually disabled...
+# fully contained. This is caused by the shifting: each shift of 0.65 times
+# the change in size along the direction of a side is larger than the margin
+# between the inradii of the two triangles, so with shifting disabled there
+# are no such triangles. The affected triangles can be listed by applying
+# 'find_uncontained_shapes' to the output of 'make_design_trajectory' with
+# 'sides=3'.
@@ -178,6 +178,12 @@ CITE_DESIGN = {
     "line_colour": "#1D1D1F",
 }
 
+# Set to True to save single images with no border straight to image files,
+# colouring each square by indexing the colour map, rather than plotting them.
+# The size, in pixels along the longest side, matches the plotted images.
+SAVE_IMAGES_DIRECTLY = False
+DIRECT_IMAGE_SIZE = 3696
+
 
 def convert_rgb_tuple(tuple_256):
     """Convert R,G,B Decimal Code from 8-bit integers to [0, 1] floats.
@@ -240,8 +246,29 @@ def format_axes(
         ax.set_facecolor(face_colour)
 
 
+def save_one_image_directly(name, image, cmap):
+    """Save an image using a given colourmap without plotting it."""
+    # Scale values to colour indices as 'imshow' does, then index the colours:
+    value_range = image.max() - image.min()
+    scale = cmap.N / value_range if value_range else 0
+    indices = np.clip((image - image.min()) * scale, 0, cmap.N - 1)
+    colours = cmap(np.arange(cmap.N), bytes=True)[indices.astype(int)]
+
+    # Scale up each square to a block of pixels by nearest-neighbour indexing:
+    height, width = (
+        round(DIRECT_IMAGE_SIZE * length / max(image.shape))
+        for length in image.shape
+    )
+    rows = np.arange(height) * image.shape[0] // height
+    cols = np.arange(width) * image.shape[1] // width
+    plt.imsave("img/%s.png" % name, colours[np.ix_(rows, cols)])
+
+
 def plot_one_image(name, image, cmap, border_params=False):
     """Plot a formatted image using a given colourmap."""
+    if SAVE_IMAGES_DIRECTLY and not border_params:
+        save_one_image_directly(name, image, cmap)
+        return
     if not border_params:  # the default is no border (including no spines)
         border_params = (0.0, "white")
     fig, ax = plt.subplots()